@@ -7,10 +7,13 @@ adding the decorator to the class itself.
 """
 
 import inspect
+import os
 import typing
-from contextlib import suppress
 from functools import wraps
 
+# "0" turns type checks off, "1" turns them on; unset follows __debug__
+ENV_VAR = "ESPSWARM_ENFORCE_TYPES"
+
 
 def _is_unparameterized_special_typing(type_hint):
     # Check for typing.Any, typing.Union, typing.ClassVar (without parameters)
@@ -22,35 +25,61 @@ def _is_unparameterized_special_typing(type_hint):
         return False
 
 
+def _expected_type(type_hint):
+    """What isinstance() should check a value against, or None to accept anything"""
+    if _is_unparameterized_special_typing(type_hint):
+        return None
+    if hasattr(type_hint, "__origin__") and type_hint.__origin__ is not None:
+        return type_hint.__origin__
+    elif hasattr(type_hint, "__args__") and type_hint.__args__ is not None:
+        return type_hint.__args__
+    return type_hint
+
+
+def _enabled():
+    """On in normal runs and off under `python -O`, unless ENV_VAR says otherwise"""
+    value = os.environ.get(ENV_VAR)
+    if not value:
+        return __debug__
+    return value.lower() not in ("0", "off", "false")
+
+
 def enforce_types(target):
     """Class decorator adding type checks to all member functions
-    """
-    def check_types(spec, *args, **kwargs):
-        parameters = dict(zip(spec.args, args))
-        parameters.update(kwargs)
-        for name, value in parameters.items():
-            with suppress(KeyError):  # Assume un-annotated parameters can be any type
-                type_hint = spec.annotations[name]
-                if _is_unparameterized_special_typing(type_hint):
-                    continue
-
-                if hasattr(type_hint, "__origin__") and type_hint.__origin__ is not None:
-                    actual_type = type_hint.__origin__
-                elif hasattr(type_hint, "__args__") and type_hint.__args__ is not None:
-                    actual_type = type_hint.__args__
-                else:
-                    actual_type = type_hint
 
-                if not isinstance(value, actual_type):
-                    raise TypeError("Unexpected type for '{}' (expected {} but found {})"
-                                    .format(name, type_hint, type(value)))
+    The checks for each function are worked out once, here, so a call only
+    runs isinstance on its annotated arguments. Functions without annotated
+    parameters are left unwrapped, and with checking disabled (see ENV_VAR)
+    nothing is wrapped at all.
+    """
+    if not _enabled():
+        return target
 
     def decorate(func):
         spec = inspect.getfullargspec(func)
+        positions = {name: i for i, name in enumerate(spec.args)}
+        checks = []  # (position or None for keyword-only, name, type to check, type hint)
+        for name, type_hint in spec.annotations.items():
+            if name == "return":
+                continue
+            expected = _expected_type(type_hint)
+            if expected is not None:
+                checks.append((positions.get(name), name, expected, type_hint))
+        if not checks:
+            return func
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            check_types(spec, *args, **kwargs)
+            for position, name, expected, type_hint in checks:
+                if position is not None and position < len(args):
+                    value = args[position]
+                elif name in kwargs:
+                    value = kwargs[name]
+                else:
+                    continue  # Left to its default
+                if not isinstance(value, expected):
+                    raise TypeError("Unexpected type for '{}' (expected {} but found {})"
+                                    .format(name, type_hint, type(value)))
             return func(*args, **kwargs)
 
         return wrapper
@@ -0,0 +1,209 @@
+""" Serial transport for an ESPTelloCLI adapter with a background reader thread """
+import asyncio
+import collections
+import heapq
+import itertools
+import threading
+import time
+import serial
+
+# Request priorities: lower goes first when several commands wait for the port
+CONTROL = 0  # Flight and setup commands
+QUERY = 1  # Read commands such as battery?, e.g. from a telemetry poller
+
+
+class _Pending:
+    """ A command waiting for its reply """
+    __slots__ = ('command', 'expected', 'on_reply', 'line', 'expired', 'sent')
+
+    def __init__(self, command, expected, on_reply):
+        self.command = command
+        self.expected = expected
+        self.on_reply = on_reply  # Called with the reply line, or None if it could not be sent
+        self.line = None
+        self.expired = None  # time.monotonic() when its caller stopped waiting
+        self.sent = False
+
+    def matches(self, line):
+        """ Replies count when they contain `expected`; Tello errors end the wait early """
+        return self.expected in line or line.startswith('error')
+
+
+class SerialTransport:
+    """ Frames the adapter's output into lines and hands each to the command waiting for it
+
+    A reader thread reads the port continuously. Lines end at a newline, or at
+    a pause in the output because the adapter forwards Tello replies without
+    one. Each line goes to the oldest outstanding command it matches, so
+    waiting returns as soon as the reply arrives. Lines nobody is waiting for
+    (adapter messages, telemetry, replies to a command that already timed out)
+    are kept in `unsolicited` instead of satisfying a later command.
+
+    Commands expecting a reply are written one at a time, as the Tello
+    answers them in order. Waiting commands are sent by priority (CONTROL
+    before QUERY), so polling never holds up flight commands by more than
+    the one query already on the air.
+    """
+
+    def __init__(self, serial_name, baudrate=115200, idle_timeout=0.01, late_reply_grace=1.0,
+                 max_unsolicited=100, port=None):
+        """ Open the port and start reading
+
+        Arguments:
+            serial_name: serial port of the adapter, e.g. /dev/ttyUSB0
+            baudrate: serial speed the adapter uses
+            idle_timeout: seconds of silence that end a reply without a newline
+            late_reply_grace: seconds a timed out command still claims its late reply
+            max_unsolicited: unsolicited lines kept, oldest dropped first
+            port: an already open serial.Serial-like object to use instead
+        """
+        if port is None:
+            port = serial.Serial(serial_name, baudrate, timeout=idle_timeout,
+                                 parity=serial.PARITY_NONE)
+        self.port = port
+        self.late_reply_grace = late_reply_grace
+        self.unsolicited = collections.deque(maxlen=max_unsolicited)
+        self.late_replies = 0
+        self._pending = []  # Sent and waiting for a reply, or timed out within the grace
+        self._queue = []  # (priority, sequence, pending, data) not sent yet
+        self._sequence = itertools.count()
+        self._active = None  # The sent command whose reply is due
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._read_loop, daemon=True,
+                                        name='serial-' + str(serial_name))
+        self._thread.start()
+
+    def send(self, command):
+        """ Write a command that gets no reply, e.g. rc """
+        if not command.endswith('\n'):
+            command += '\n'
+        with self._send_lock:
+            self.port.write(command.encode('utf-8'))
+
+    def request(self, command, expected, timeout, priority=CONTROL):
+        """ Write a command and wait for its reply
+
+        Arguments:
+            command: command text; a newline is added if missing
+            expected: text the reply must contain; '' accepts any line
+            timeout: seconds to wait, including any wait for the port; fractions allowed
+            priority: CONTROL or QUERY
+        Returns the reply line, or None if none arrived in time.
+        """
+        event = threading.Event()
+        pending = self._write_pending(command, expected, lambda line: event.set(), priority)
+        event.wait(timeout)
+        return self._finish(pending)
+
+    async def request_async(self, command, expected, timeout, priority=CONTROL):
+        """ request() for asyncio: waits without blocking the event loop or using a thread """
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+
+        def resolve(line):
+            if not reply.done():
+                reply.set_result(line)
+
+        pending = self._write_pending(command, expected,
+                                      lambda line: loop.call_soon_threadsafe(resolve, line), priority)
+        try:
+            await asyncio.wait_for(reply, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            line = self._finish(pending)  # Also when cancelled, so a late reply is absorbed
+        return line
+
+    def _write_pending(self, command, expected, on_reply, priority):
+        if not command.endswith('\n'):
+            command += '\n'
+        pending = _Pending(command.strip(), expected, on_reply)
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._sequence), pending,
+                                         command.encode('utf-8')))
+        self._pump()
+        return pending
+
+    def _pump(self):
+        """ Send the next waiting command if none is awaiting its reply """
+        while True:
+            with self._lock:
+                if self._active is not None or not self._queue:
+                    return
+                _, _, pending, data = heapq.heappop(self._queue)
+                if pending.expired is not None:
+                    continue  # Its caller gave up before it was sent
+                # Listed before writing so even an instant reply finds its command
+                pending.sent = True
+                self._active = pending
+                self._pending.append(pending)
+            try:
+                with self._send_lock:
+                    self.port.write(data)
+                return
+            except (serial.SerialException, OSError):
+                with self._lock:
+                    self._pending.remove(pending)
+                    self._active = None
+                pending.on_reply(None)
+
+    def _finish(self, pending):
+        with self._lock:
+            line = pending.line
+            if line is None:
+                pending.expired = time.monotonic()
+                if self._active is pending:
+                    self._active = None  # Its reply may still come; the grace absorbs it
+        self._pump()
+        return line
+
+    def _read_loop(self):
+        buffer = bytearray()
+        while not self._closed:
+            try:
+                data = self.port.read(self.port.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError):
+                break  # Port closed
+            if data:
+                buffer += data
+                while True:
+                    end = buffer.find(b'\n')
+                    if end < 0:
+                        break
+                    self._dispatch(bytes(buffer[:end]))
+                    del buffer[:end + 1]
+            elif buffer:
+                self._dispatch(bytes(buffer))  # The read timed out: a reply without a newline
+                buffer.clear()
+
+    def _dispatch(self, raw):
+        line = raw.decode('utf-8', errors='replace').strip()
+        if not line:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._pending = [p for p in self._pending
+                             if p.expired is None or now - p.expired < self.late_reply_grace]
+            for pending in self._pending:
+                if pending.matches(line):
+                    self._pending.remove(pending)
+                    if pending.expired is not None:
+                        self.late_replies += 1  # Absorbed so it cannot answer a later command
+                        return
+                    pending.line = line
+                    if self._active is pending:
+                        self._active = None
+                    break
+            else:
+                self.unsolicited.append(line)
+                return
+        pending.on_reply(line)
+        self._pump()
+
+    def close(self):
+        """ Stop reading and close the port """
+        self._closed = True
+        self.port.close()
+        self._thread.join(1.0)
@@ -1,16 +1,138 @@
 """Library for controlling multiple DJI Ryze Tello drones.
 """
 
-from threading import Thread, Barrier
+import asyncio
+import time
+from threading import Thread, Barrier, Lock
 from queue import Queue
 from typing import List, Callable
 
-from ESP_32_Controller.lib.ESPTelloCLI.ESPSwarm.tello import Tello, TelloException
+from ESP_32_Controller.lib.ESPTelloCLI.ESPSwarm.tello import AsyncTello, Tello
 from ESP_32_Controller.lib.ESPTelloCLI.ESPSwarm.enforce_types import enforce_types
+from ESP_32_Controller.lib.ESPTelloCLI.ESPSwarm.telemetry import SwarmTelemetry
+
+
+class SwarmConnectError(Exception):
+    """Raised when drones of a swarm fail to connect. `failures` lists a
+    (serial port, SSID, reason) tuple per failed drone.
+    """
+
+    def __init__(self, failures):
+        super().__init__("connect failed: " + ", ".join(
+            serial + " " + SSID + " (" + reason + ")" for serial, SSID, reason in failures))
+        self.failures = failures
+
+
+def connectSerialSSID(serialSSID: list, deadline=None):
+    """Connect a Tello for each serial port and Tello SSID pair and put it
+    in SDK mode. All drones connect at the same time, so this takes as long
+    as the slowest drone rather than the sum of them.
+
+    Arguments:
+        serialSSID: list of serial port and Tello SSID pairs
+        deadline: seconds to wait for the whole swarm; drones still
+            connecting then count as failed. None waits for each drone's
+            own connect timeout.
+
+    Returns (tellos, failures): the connected drones, in the order given,
+    and a (serial port, SSID, reason) tuple per drone that failed. Drones
+    that connected but did not enter SDK mode are in both.
+    """
+    if not serialSSID:
+        raise Exception("No serial, SSID pairs provided")
+
+    drones = [Tello(serial, SSID) for serial, SSID in serialSSID]
+    results = [None] * len(drones)
+    lock = Lock()
+    late = False  # Set with `results` snapshotted under `lock`
+
+    def handshake(i):
+        tello = drones[i]
+        try:
+            if not tello.connect():
+                result = "connect failed"
+            elif not tello.sdkmode():
+                result = "command failed"
+            else:
+                result = "ok"
+        except Exception as error:  # e.g. the serial port does not exist
+            result = "error: " + str(error)
+        with lock:
+            if not late:
+                results[i] = result
+                return
+        tello.close()  # Finished after the deadline, so it is not in the swarm
+
+    threads = [Thread(target=handshake, daemon=True, args=(i,)) for i in range(len(drones))]
+    for thread in threads:
+        thread.start()
+    end = None if deadline is None else time.monotonic() + deadline
+    for thread in threads:
+        thread.join(None if end is None else max(0.0, end - time.monotonic()))
+    with lock:
+        late = True
+        finished = list(results)
+
+    tellos, failures = [], []
+    for (serial, SSID), tello, result in zip(serialSSID, drones, finished):
+        if result in ("ok", "command failed"):
+            tellos.append(tello)
+        else:
+            tello.close()
+        if result != "ok":
+            failures.append((serial, SSID, result or "timed out"))
+    return tellos, failures
+
+
+def _connectSwarm(serialSSID, deadline, allowPartial):
+    tellos, failures = connectSerialSSID(serialSSID, deadline)
+    for serial, SSID, reason in failures:
+        print(reason + ": " + serial + " " + SSID)
+    if not tellos or (len(tellos) < len(serialSSID) and not allowPartial):
+        for tello in tellos:
+            tello.close()
+        raise SwarmConnectError(failures)
+    return tellos, failures
+
+
+class _TelemetryMethods:
+    """Background telemetry shared by both swarm classes"""
+
+    def startTelemetry(self, rate_hz=1.0, queries=None, timeout=0.5):
+        """Poll every drone's read commands (battery?, height?, ...) in the
+        background and cache the replies; see telemetry.py. Polls give way
+        to flight commands, so they do not stall the swarm.
+
+        ```python
+        swarm.startTelemetry(rate_hz=2, queries=["battery", "height"])
+        ```
+        """
+        self.stopTelemetry()
+        self.swarmTelemetry = SwarmTelemetry(self.tellos, rate_hz, queries, timeout).start()
+        return self.swarmTelemetry
+
+    def stopTelemetry(self):
+        """Stop the pollers started by `startTelemetry`"""
+        if self.swarmTelemetry is not None:
+            self.swarmTelemetry.stop()
+            self.swarmTelemetry = None
+
+    def snapshot(self):
+        """Cached state of every drone, without any serial I/O: one dict per
+        drone, in swarm order, of query name -> TelemetryValue(value, timestamp).
+
+        ```python
+        for i, state in enumerate(swarm.snapshot()):
+            print(i, state.get("battery"))
+        ```
+        """
+        if self.swarmTelemetry is None:
+            return [{} for _ in self.tellos]
+        return self.swarmTelemetry.snapshot()
 
 
 @enforce_types
-class TelloSwarm:
+class TelloSwarm(_TelemetryMethods):
     """Swarm library for controlling multiple Tellos simultaneously
     """
 
@@ -19,31 +141,25 @@ class TelloSwarm:
     funcBarier: Barrier
     funcQueues: List[Queue]
     threads: List[Thread]
+    failures: list
+    swarmTelemetry: SwarmTelemetry
 
     @staticmethod
-    def fromSerialSSID(serialSSID: list):
+    def fromSerialSSID(serialSSID: list, deadline=None, allowPartial: bool = False):
         """Create TelloSwarm from a list of serial port and Tello SSID pairs.
+        The drones connect in parallel.
 
         Arguments:
             serialSSID: list of serial port and Tello SSID pairs
+            deadline: seconds to wait for all drones to connect, see
+                `connectSerialSSID`
+            allowPartial: fly with the drones that connected instead of
+                raising SwarmConnectError; the others are in `failures`
         """
-        if not serialSSID:
-            raise Exception("No serial, SSID pairs provided")
-
-        tellos = []
-        for serial, SSID in serialSSID:
-            a_drone = Tello(serial, SSID)
-            if a_drone.connect():
-                if a_drone.sdkmode():
-                    tellos.append(a_drone)
-                else:
-                    tellos.append(a_drone)
-                    print("command failed: " + serial + " " + SSID)
-            else:
-                raise Exception("connect failed: " + serial + " " + SSID)
-
-
-        return TelloSwarm(tellos)
+        tellos, failures = _connectSwarm(serialSSID, deadline, allowPartial)
+        swarm = TelloSwarm(tellos)
+        swarm.failures = failures
+        return swarm
 
     def __init__(self, tellos: List[Tello]):
         """Initialize a TelloSwarm instance
@@ -52,6 +168,8 @@ class TelloSwarm:
             tellos: list of [Tello][tello] instances
         """
         self.tellos = tellos
+        self.failures = []
+        self.swarmTelemetry = None
         self.barrier = Barrier(len(tellos))
         self.funcBarrier = Barrier(len(tellos) + 1)
         self.funcQueues = [Queue() for tello in tellos]
@@ -154,3 +272,131 @@ class TelloSwarm:
         ```
         """
         return len(self.tellos)
+
+
+class SwarmResults(list):
+    """One result per drone, in swarm order. A drone that failed has False
+    (no reply or an error reply) or the exception it raised, e.g.
+    `asyncio.TimeoutError`, instead of its reply.
+    """
+
+    @property
+    def failed(self):
+        """Indices of the drones that failed"""
+        return [i for i, result in enumerate(self)
+                if result is False or isinstance(result, BaseException)]
+
+    @property
+    def ok(self):
+        """True when every drone succeeded"""
+        return not self.failed
+
+
+class AsyncTelloSwarm(_TelemetryMethods):
+    """Swarm library for controlling multiple Tellos with asyncio
+
+    Commands go to all drones at once and each drone's reply is awaited on
+    its own, so a slow drone only delays the callers waiting for it. Unlike
+    TelloSwarm there are no worker threads and no barrier: each serial port's
+    reader thread hands replies straight to the event loop.
+
+    ```python
+    swarm = AsyncTelloSwarm.fromSerialSSID([...])
+    results = await swarm.takeoff()
+    if not results.ok:
+        print("takeoff failed on", results.failed)
+    ```
+    """
+
+    @staticmethod
+    def fromSerialSSID(serialSSID: list, timeout: float = None, deadline=None,
+                       allowPartial: bool = False):
+        """Create AsyncTelloSwarm from a list of serial port and Tello SSID pairs.
+
+        Arguments:
+            serialSSID: list of serial port and Tello SSID pairs
+            timeout: default per-drone timeout, see `__init__`
+            deadline, allowPartial: as for TelloSwarm.fromSerialSSID
+        """
+        tellos, failures = _connectSwarm(serialSSID, deadline, allowPartial)
+        swarm = AsyncTelloSwarm(tellos, timeout)
+        swarm.failures = failures
+        return swarm
+
+    def __init__(self, tellos: List[Tello], timeout: float = None):
+        """Initialize an AsyncTelloSwarm instance
+
+        Arguments:
+            tellos: list of connected [Tello][tello] instances
+            timeout: seconds each drone gets per call before it counts as
+                failed; None leaves it to the Tello's own command timeouts
+        """
+        self.tellos = tellos
+        self.drones = [AsyncTello(tello) for tello in tellos]
+        self.timeout = timeout
+        self.failures = []
+        self.swarmTelemetry = None
+
+    async def _run(self, awaitable, timeout):
+        try:
+            if timeout is None:
+                return await awaitable
+            return await asyncio.wait_for(awaitable, timeout)
+        except Exception as error:  # Reported in the results, the other drones carry on
+            return error
+
+    async def parallel(self, func, timeout: float = None):
+        """Call `func` for each drone concurrently and wait for all of them.
+        The function retrieves two arguments: the index `i` of the current
+        drone and `tello`, its [AsyncTello][tello], and returns an awaitable.
+
+        ```python
+        await swarm.parallel(lambda i, tello: tello.move_up(50 + i * 10))
+        ```
+
+        Arguments:
+            timeout: per-drone timeout for this call, instead of the swarm's
+        Returns a SwarmResults.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        return SwarmResults(await asyncio.gather(
+            *(self._run(func(i, tello), timeout) for i, tello in enumerate(self.drones))))
+
+    async def sequential(self, func, timeout: float = None):
+        """Call `func` for each drone, one after the other; see `parallel`."""
+        timeout = self.timeout if timeout is None else timeout
+        results = SwarmResults()
+        for i, tello in enumerate(self.drones):
+            results.append(await self._run(func(i, tello), timeout))
+        return results
+
+    def rc(self, left_right, forward_back, up_down, rotate):
+        """Send the same rc command to every drone without waiting; rc gets
+        no reply, so this returns as soon as the commands are written.
+        """
+        for tello in self.tellos:
+            tello.set_rc(left_right, forward_back, up_down, rotate)
+
+    def __getattr__(self, attr):
+        """Call a standard tello function concurrently on all drones.
+
+        ```python
+        await swarm.takeoff()
+        await swarm.move_up(50)
+        ```
+        """
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+
+        def callAll(*args, **kwargs):
+            return self.parallel(lambda i, tello: getattr(tello, attr)(*args, **kwargs))
+
+        return callAll
+
+    def __iter__(self):
+        """Iterate over all drones in the swarm, as [AsyncTello][tello]s."""
+        return iter(self.drones)
+
+    def __len__(self):
+        """Return the amount of tellos in the swarm"""
+        return len(self.drones)
@@ -0,0 +1,97 @@
+""" Background telemetry for ESPSwarm drones
+
+Each drone's read commands are polled on a thread of its own and the replies
+cached, so reading the state of the swarm does no serial I/O. Polls go to the
+transport at QUERY priority: a flight command waits for at most the one query
+already on the air, and while a flight command awaits its reply the polls
+wait instead (their values keep their old timestamps).
+"""
+import threading
+import time
+from collections import namedtuple
+
+try:
+    from ESP_32_Controller.lib.ESPTelloCLI.ESPSwarm.serial_transport import QUERY
+except ImportError:  # Run from this directory
+    from serial_transport import QUERY
+
+# Cached name -> Tello read command, as sent by the Tello get_* methods
+QUERIES = {
+    'battery': 'battery?',
+    'height': 'height?',
+    'speed': 'speed?',
+    'flight_time': 'time?',
+    'temp': 'temp?',
+    'attitude': 'attitude?',
+    'barometer': 'baro?',
+    'acceleration': 'acceleration?',
+    'tof': 'tof?',
+    'wifi': 'wifi?',
+}
+
+# A cached reply: the text the Tello sent and time.monotonic() when it arrived
+TelemetryValue = namedtuple('TelemetryValue', 'value timestamp')
+
+
+class TelemetryPoller(threading.Thread):
+    """ Keeps one drone's state fresh by polling its read commands """
+
+    def __init__(self, tello, rate_hz=1.0, queries=None, timeout=0.5):
+        """ Arguments:
+            tello: connected Tello
+            rate_hz: polling rounds per second; each round sends every query once
+            queries: names from QUERIES to poll, default all of them
+            timeout: seconds to wait for each reply, including waiting for the port
+        """
+        super().__init__(daemon=True, name='telemetry-' + tello.tello_SSID)
+        self.tello = tello
+        self.interval = 1.0 / rate_hz
+        self.queries = [(name, QUERIES[name]) for name in (queries or QUERIES)]
+        self.timeout = timeout
+        self.state = {}
+        self.failures = 0  # Queries with no reply in time or an error reply
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            for name, command in self.queries:
+                if self._stop_event.is_set():
+                    return
+                line = self.tello.transport.request(command, '', self.timeout, QUERY)
+                if line is None or line.startswith('error'):
+                    self.failures += 1
+                    continue
+                with self._lock:
+                    self.state[name] = TelemetryValue(line, time.monotonic())
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def snapshot(self):
+        """ name -> TelemetryValue of everything received so far """
+        with self._lock:
+            return dict(self.state)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class SwarmTelemetry:
+    """ A TelemetryPoller per drone, read together """
+
+    def __init__(self, tellos, rate_hz=1.0, queries=None, timeout=0.5):
+        """ Arguments as for TelemetryPoller, applied to every drone """
+        self.pollers = [TelemetryPoller(tello, rate_hz, queries, timeout) for tello in tellos]
+
+    def start(self):
+        for poller in self.pollers:
+            poller.start()
+        return self
+
+    def stop(self):
+        for poller in self.pollers:
+            poller.stop()
+
+    def snapshot(self):
+        """ One name -> TelemetryValue dict per drone, in swarm order; does no I/O """
+        return [poller.snapshot() for poller in self.pollers]
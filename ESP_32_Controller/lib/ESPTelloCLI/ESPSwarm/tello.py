@@ -1,15 +1,21 @@
 """ Tello class based on DJITelloPy API Reference """
-import time
-import serial
+try:
+    from ESP_32_Controller.lib.ESPTelloCLI.ESPSwarm.serial_transport import CONTROL, QUERY, SerialTransport
+except ImportError:  # Run from this directory
+    from serial_transport import CONTROL, QUERY, SerialTransport
 
 class TelloException:
     pass
 
 class Tello:
     """ Tello class """
-    def __init__(self, serial_name, tello_SSID):
+    def __init__(self, serial_name, tello_SSID, timeouts=None):
+        """ timeouts: optional seconds to wait per command word, e.g. {'takeoff': 8, 'battery?': 0.5},
+        overriding the defaults given in each method """
         self.serial_name = serial_name
         self.tello_SSID = tello_SSID
+        self.timeouts = dict(timeouts or {})
+        self.transport = None
         self.serial_port = None
 
     @staticmethod
@@ -22,39 +28,54 @@ class Tello:
                 return upper_limit
         return x
 
-    @staticmethod
-    def command_response(serial_port, command, expected, secs):
-        """ Write Tello command then return Tello response """
-        serial_port.write(command.encode('utf-8'))
-        print(command)
-        if secs == 0:
+    def command_response(self, command, expected, timeout):
+        """ Write Tello command then return Tello response
+
+        Returns the reply line if it contains `expected`, False on an error
+        reply or no reply within `timeout` seconds, and True straight away
+        when the timeout is 0 (commands without a reply). Read commands
+        (ending in '?') give way to flight commands waiting for the port.
+        """
+        timeout = self.timeouts.get(command.split(None, 1)[0], timeout)
+        if timeout == 0:
+            self.transport.send(command)
             return True
-        expected = expected.encode('utf-8')
-        for i in range(0, secs):
-            a_line = serial_port.read_until('\n')
-            print(i)
-            if a_line:
-                print(a_line)
-                if not expected or expected in a_line:
-                    return a_line
-        return False
+        line = self.transport.request(command, expected, timeout, self.priority(command))
+        if line is None or expected not in line:
+            return False
+        return line
+
+    @staticmethod
+    def priority(command):
+        """ Transport priority of a command: QUERY for read commands, CONTROL otherwise """
+        return QUERY if command.strip().endswith('?') else CONTROL
 
     def connect(self):
         """ Connect ESPTelloCLI adapter on serial port to Tello drone SSID """
-        self.serial_port = serial.Serial(self.serial_name, 115200, timeout=1,
-                                         parity=serial.PARITY_NONE)
-        print(self.serial_port)
-        return self.command_response(self.serial_port,
-            'connect ' + self.tello_SSID + '\n', 'connected', 20)
+        if self.transport is not None:
+            # Already open: a second reader on the port would race this one for replies
+            if self.command_response('connect?\n', 'ok', 3):
+                return 'ok'
+        else:
+            self.transport = SerialTransport(self.serial_name)
+            self.serial_port = self.transport.port
+        return self.command_response('connect ' + self.tello_SSID + '\n', 'connected', 20)
+
+    def close(self):
+        """ Close the serial port """
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+            self.serial_port = None
 
     def sdkmode(self):
         """ Put Tello drone in SDK mode """
-        return self.command_response(self.serial_port, 'command', 'ok', 3)
+        return self.command_response('command', 'ok', 3)
 
     def set_speed(self, speed):
         """ Set speed """
         speed = str(self.constrain(speed, 10, 100))
-        return self.command_response(self.serial_port, 'speed' + speed + '\n', 'ok', 3)
+        return self.command_response('speed' + speed + '\n', 'ok', 3)
 
     def set_rc(self, left_right, forward_back, up_down, rotate):
         """ Radio/Control (rc) mode. Note: no response """
@@ -63,63 +84,63 @@ class Tello:
         up_down = str(self.constrain(up_down, -100, 100))
         rotate = str(self.constrain(rotate, -100, 100))
         command = 'rc ' + left_right + ' ' + forward_back + ' ' + up_down + ' ' + rotate + '\n'
-        return self.command_response(self.serial_port, command, '', 0)
+        return self.command_response(command, '', 0)
 
     def move_up(self, cm):
         """ Go up centimeters """
         cm = str(self.constrain(cm, 20, 500))
-        return self.command_response(self.serial_port, 'up ' + cm + '\n', 'ok', 5)
+        return self.command_response('up ' + cm + '\n', 'ok', 5)
 
     def move_down(self, cm):
         """ Go down centimeters """
         cm = str(self.constrain(cm, 20, 500))
-        return self.command_response(self.serial_port, 'down ' + cm + '\n', 'ok', 5)
+        return self.command_response('down ' + cm + '\n', 'ok', 5)
 
     def move_forward(self, cm):
         """ Go left centimeters """
         cm = str(self.constrain(cm, 20, 500))
-        return self.command_response(self.serial_port, 'forward ' + cm + '\n', 'ok', 5)
+        return self.command_response('forward ' + cm + '\n', 'ok', 5)
 
     def move_back(self, cm):
         """ Go left centimeters """
         cm = str(self.constrain(cm, 20, 500))
-        return self.command_response(self.serial_port, 'back ' + cm + '\n', 'ok', 5)
+        return self.command_response('back ' + cm + '\n', 'ok', 5)
 
     def move_left(self, cm):
         """ Go left centimeters """
         cm = str(self.constrain(cm, 20, 500))
-        return self.command_response(self.serial_port, 'left ' + cm + '\n', 'ok', 5)
+        return self.command_response('left ' + cm + '\n', 'ok', 5)
 
     def move_right(self, cm):
         """ Go right centimeters """
         cm = str(self.constrain(cm, 20, 500))
-        return self.command_response(self.serial_port, 'right ' + cm + '\n', 'ok', 5)
+        return self.command_response('right ' + cm + '\n', 'ok', 5)
 
     def rotate_clockwise(self, degrees):
         """ Rotate clock wise degrees """
         degrees = str(self.constrain(degrees, 1, 3600))
-        return self.command_response(self.serial_port, 'cw ' + degrees + '\n', 'ok', 3)
+        return self.command_response('cw ' + degrees + '\n', 'ok', 3)
 
     def rotate_counter_clockwise(self, degrees):
         """ rotate counter clock wise degrees """
         degrees = str(self.constrain(degrees, 1, 3600))
-        return self.command_response(self.serial_port, 'ccw ' + degrees + '\n', 'ok', 3)
+        return self.command_response('ccw ' + degrees + '\n', 'ok', 3)
 
     def flip_forward(self):
         """ Flip forward """
-        return self.command_response(self.serial_port, 'flip f\n', 'ok', 5)
+        return self.command_response('flip f\n', 'ok', 5)
 
     def flip_back(self):
         """ Flip backward """
-        return self.command_response(self.serial_port, 'flip b\n', 'ok', 5)
+        return self.command_response('flip b\n', 'ok', 5)
 
     def flip_left(self):
         """ Flip left """
-        return self.command_response(self.serial_port, 'flip l\n', 'ok', 5)
+        return self.command_response('flip l\n', 'ok', 5)
 
     def flip_right(self):
         """ Flip right """
-        return self.command_response(self.serial_port, 'flip r\n', 'ok', 5)
+        return self.command_response('flip r\n', 'ok', 5)
 
     def go_xyz_speed(self, x, y, z, speed):
         """ Fly to x y z at speed (cm/s) """
@@ -128,7 +149,7 @@ class Tello:
         z = str(self.constrain(z, -500, 500))
         speed = str(self.constrain(speed, 10, 100))
         command = 'go ' + x + ' ' + y + ' ' + z + ' ' + speed + '\n'
-        return self.command_response(self.serial_port, command, 'ok', 3)
+        return self.command_response(command, 'ok', 3)
 
     def curve_xyz_speed(self, x1, y1, z1, x2, y2, z2, speed):
         """ Fly a curve defined by the current and two given coords with speed cm/s """
@@ -141,59 +162,82 @@ class Tello:
         speed = str(self.constrain(speed, 10, 60))
         command = 'curve ' + x1 + ' ' + y1 + ' ' + z1 + ' ' + \
             x2 + ' ' + y2 + ' ' + z2 + ' ' + speed + '\n'
-        return self.command_response(self.serial_port, command, 'ok', 3)
+        return self.command_response(command, 'ok', 3)
 
     def get_battery(self):
         """ Return battery percentage """
-        return self.command_response(self.serial_port, 'battery?\n', '', 3)
+        return self.command_response('battery?\n', '', 3)
 
     def get_height(self):
         """ Return height """
-        return self.command_response(self.serial_port, 'height?\n', '', 3)
+        return self.command_response('height?\n', '', 3)
 
     def get_speed(self):
         """ Return speed """
-        return self.command_response(self.serial_port, 'speed?\n', '', 3)
+        return self.command_response('speed?\n', '', 3)
 
     def get_flight_time(self):
         """ Return time motors have been active """
-        return self.command_response(self.serial_port, 'time?\n', '', 3)
+        return self.command_response('time?\n', '', 3)
 
     def get_temp(self):
         """ Return temp """
-        return self.command_response(self.serial_port, 'temp?\n', '', 3)
+        return self.command_response('temp?\n', '', 3)
 
     def get_attitude(self):
         """ Return attitude """
-        return self.command_response(self.serial_port, 'attitude?\n', '', 3)
+        return self.command_response('attitude?\n', '', 3)
 
     def get_barometer(self):
         """ Return barometric pressure """
-        return self.command_response(self.serial_port, 'baro?\n', '', 3)
+        return self.command_response('baro?\n', '', 3)
 
     def get_acceleration(self):
         """ Return acceleration """
-        return self.command_response(self.serial_port, 'acceleration?\n', '', 3)
+        return self.command_response('acceleration?\n', '', 3)
 
     def get_distance_tof(self):
         """ Return current distance value from TOF in cm """
-        return self.command_response(self.serial_port, 'tof?\n', '', 3)
+        return self.command_response('tof?\n', '', 3)
 
     def get_wifi(self):
         """ Return WiFi signal to noise ratio """
-        return self.command_response(self.serial_port, 'wifi?\n', '', 3)
+        return self.command_response('wifi?\n', '', 3)
 
     def takeoff(self):
         """ Takeoff """
-        return self.command_response(self.serial_port, 'takeoff\n', 'ok', 20)
+        return self.command_response('takeoff\n', 'ok', 20)
 
     def land(self):
         """ Land """
-        return self.command_response(self.serial_port, 'land\n', 'ok', 10)
+        return self.command_response('land\n', 'ok', 10)
 
     def emergency(self):
         """ Emergency -- all motors off NOW """
-        return self.command_response(self.serial_port, 'emergency\n', 'ok', 10)
+        return self.command_response('emergency\n', 'ok', 10)
+
+class AsyncTello(Tello):
+    """ A connected Tello whose commands are coroutines
+
+    Shares the serial port of the Tello it wraps; every command method returns
+    an awaitable that resolves to the same value the Tello method returns.
+    """
+    def __init__(self, tello):
+        super().__init__(tello.serial_name, tello.tello_SSID)
+        self.timeouts = tello.timeouts
+        self.transport = tello.transport
+        self.serial_port = tello.serial_port
+
+    async def command_response(self, command, expected, timeout):
+        """ Write Tello command then return Tello response, as in Tello.command_response """
+        timeout = self.timeouts.get(command.split(None, 1)[0], timeout)
+        if timeout == 0:
+            self.transport.send(command)
+            return True
+        line = await self.transport.request_async(command, expected, timeout, self.priority(command))
+        if line is None or expected not in line:
+            return False
+        return line
 
 def mymain():
     """ Test this class WARNING: *** Drone will FLY *** """
@@ -0,0 +1,303 @@
+"""
+Control-loop benchmark: throughput and latency of every stage between the
+headset and the drone, and end to end from an onset in the EEG to the
+command reaching the drone.
+
+Stages, each timed on its own:
+    features    extract_features on one window, and StreamingFeatures per chunk
+    predict     scaler + SVC (sklearn, when installed) and the fused NumPy SVM
+    imu         right_left_command over replayed gyro/accel chunks
+    udp         Tello.send_command round trips against a local MockTello
+
+End to end, the whole threaded Pipeline runs on the replayed streams against
+a MockTello. An onset is a label change in the workload; its latency is the
+time from the onset sample coming due in the replay to the first command for
+the new label (its ACTIONS entry) the mock receives before the next onset.
+It includes the debounce hold, which is reported alongside; commands that
+arrive sooner than the hold cannot come from the onset and are counted
+separately instead.
+
+Workloads:
+    synthetic          noise with alternating class blocks and head turns (default)
+    data/eeg_data.csv  the training data, labels as onsets, synthetic IMU
+    session.rec        a recording from machine_learning.recording (no onsets)
+
+Run from the repository root:
+    python -m benchmarks.control_loop [--workload W] [--seconds N] [--speed X] [--json out.json]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from machine_learning.recording import Recording, load_session, replay_session
+from machine_learning.ml_helpers import extract_features, sliding_windows
+from machine_learning.streaming_features import StreamingFeatures
+from machine_learning.debounce import Debouncer
+from machine_learning.fast_svm import FusedSVM
+
+FS = 256
+IMU_FS = 52
+WINDOW_SIZE = FS
+HOP_SIZE = 16
+DEBOUNCE_SECONDS = 200 / FS
+CHUNK_SIZE = 12  # EEG samples per LSL chunk, as a Muse delivers them
+BLOCK_SECONDS = 4.0  # Length of one class block in the synthetic workload
+ACTIONS = {0: ('flip', ('l',)), 1: ('flip', ('r',))}
+
+
+def summary(seconds):
+    """p50/p99/max in milliseconds of a list of durations in seconds."""
+    values = np.asarray(seconds) * 1000
+    if not len(values):
+        return {'count': 0}
+    return {'count': len(values), 'p50_ms': float(np.percentile(values, 50)),
+            'p99_ms': float(np.percentile(values, 99)), 'max_ms': float(values.max())}
+
+
+def _imu(n_seconds, start, turn_every=3.0):
+    """Gyro and accel recordings of a head held still apart from a short turn every few seconds."""
+    t = start + np.arange(int(n_seconds * IMU_FS)) / IMU_FS
+    gyro = np.zeros((len(t), 3), dtype=np.float32)
+    turn = (t - start) // turn_every
+    turning = (t - start) % turn_every < 0.5
+    gyro[turning, 2] = np.where(turn[turning] % 2 == 0, -90.0, 90.0)  # Right, then left, ...
+    accel = np.tile(np.float32([0.0, 0.0, 1.0]), (len(t), 1))
+    return (Recording('gyro', 'Gyroscope', IMU_FS, gyro, t),
+            Recording('accel', 'Accelerometer', IMU_FS, accel, t.copy()))
+
+
+def load_workload(workload, seconds):
+    """
+    Returns (session, onsets): recordings keyed eeg/gyro/accel, and
+    (timestamp, new label) pairs for each change of the EEG label.
+    """
+    start = 1000.0  # Arbitrary LSL clock origin
+    if workload.endswith('.rec'):
+        session = load_session(workload)
+        if seconds:
+            for name, r in session.items():
+                keep = r.timestamps < r.timestamps[0] + seconds
+                session[name] = r._replace(samples=r.samples[keep], timestamps=r.timestamps[keep])
+        return session, []
+
+    if workload == 'synthetic':
+        n = int((seconds or 60) * FS)
+        eeg = np.random.default_rng(0).normal(0, 100, (n, 5)).astype(np.float32)
+        labels = (np.arange(n) // int(BLOCK_SECONDS * FS)) % 2
+    else:
+        import pandas as pd  # Only needed for CSV workloads
+        df = pd.read_csv(workload)
+        if seconds:
+            df = df.iloc[:int(seconds * FS)]
+        eeg = df.iloc[:, :5].to_numpy(dtype=np.float32)
+        labels = df.iloc[:, 5].to_numpy()
+
+    timestamps = start + np.arange(len(eeg)) / FS
+    changes = np.flatnonzero(np.diff(labels)) + 1
+    onsets = list(zip(timestamps[changes], labels[changes].astype(int)))
+    gyro, accel = _imu(len(eeg) / FS, start)
+    return {'eeg': Recording('eeg', 'EEG', FS, eeg, timestamps), 'gyro': gyro, 'accel': accel}, onsets
+
+
+def bench_features(eeg, max_windows=500):
+    """extract_features per window, and the streaming engine per chunk."""
+    windows = sliding_windows(eeg, WINDOW_SIZE, HOP_SIZE)[:max_windows]
+    per_window = []
+    for window in windows:
+        start = time.perf_counter()
+        extract_features(window, FS)
+        per_window.append(time.perf_counter() - start)
+
+    features = StreamingFeatures(FS, WINDOW_SIZE, eeg.shape[1], hop_size=HOP_SIZE)
+    per_chunk = []
+    start_all = time.perf_counter()
+    for offset in range(0, len(eeg), CHUNK_SIZE):
+        start = time.perf_counter()
+        features.push_chunk(eeg[offset:offset + CHUNK_SIZE])
+        per_chunk.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - start_all
+    return {'extract_features': summary(per_window),
+            'streaming_chunk': summary(per_chunk),
+            'streaming_samples_per_s': len(eeg) / elapsed}
+
+
+def bench_predict(model, eeg, n=500):
+    """Single-vector predictions: sklearn's scaler + SVC, and the fused model."""
+    features = StreamingFeatures(FS, WINDOW_SIZE, eeg.shape[1], hop_size=HOP_SIZE)
+    X = features.push_chunk(eeg[:WINDOW_SIZE + n * HOP_SIZE])[:n]
+    results = {}
+    fused = []
+    for x in X:
+        start = time.perf_counter()
+        model.predict_one(x)
+        fused.append(time.perf_counter() - start)
+    results['fused_svm'] = summary(fused)
+
+    try:
+        import joblib
+        scaler, clf = joblib.load('model/scaler.pkl'), joblib.load('model/svm_model.pkl')
+    except (ImportError, OSError):
+        return results
+    sk = []
+    for x in X:
+        start = time.perf_counter()
+        clf.predict(scaler.transform(x.reshape(1, -1)))
+        sk.append(time.perf_counter() - start)
+    results['sklearn'] = summary(sk)
+    return results
+
+
+class _CountingDrone(object):
+    def __init__(self):
+        self.commands = 0
+
+    def rotate_cw(self, degrees):
+        self.commands += 1
+
+    def rotate_ccw(self, degrees):
+        self.commands += 1
+
+
+def bench_imu(session):
+    """right_left_command over the replayed IMU streams, one LSL-sized chunk per call."""
+    from gyro.gyroscope import right_left_command
+    from gyro.orientation import OrientationEngine
+
+    inlets = replay_session({name: session[name] for name in ('gyro', 'accel')}, speed=None, max_samples=4)
+    engine = OrientationEngine()
+    engine.reset(session['accel'].samples[0])
+    drone = _CountingDrone()
+    calls = []
+    start_all = time.perf_counter()
+    while not inlets['gyro'].exhausted:
+        start = time.perf_counter()
+        right_left_command(inlets['gyro'], inlets['accel'], engine, drone)
+        calls.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - start_all
+    return {'right_left_command': summary(calls),
+            'samples_per_s': inlets['gyro'].total / elapsed, 'rotations': drone.commands}
+
+
+def bench_udp(n=200):
+    """Tello.send_command round trips against a local MockTello."""
+    from mock_tello import MockTello
+    from tello import Tello
+
+    with MockTello() as mock:
+        tello = Tello('127.0.0.1', 0, tello_ip='127.0.0.1', tello_port=mock.address[1])
+        round_trips = []
+        for _ in range(n):
+            start = time.perf_counter()
+            tello.send_command('battery?')
+            round_trips.append(time.perf_counter() - start)
+        tello.close()
+    return {'send_command': summary(round_trips)}
+
+
+def bench_end_to_end(session, onsets, model, speed):
+    """The threaded Pipeline on the replayed streams, commanding a MockTello."""
+    from gyro.orientation import OrientationEngine
+    from instrumentation import metrics
+    from mock_tello import MockTello
+    from pipeline import Pipeline
+    from tello import Tello
+
+    metrics.reset()  # Only count what the pipeline does
+    inlets = replay_session(session, speed=speed, max_samples=CHUNK_SIZE if speed else 1024)
+    engine = OrientationEngine()
+    engine.reset(session['accel'].samples[0])
+    with MockTello() as mock:
+        tello = Tello('127.0.0.1', 0, tello_ip='127.0.0.1', tello_port=mock.address[1])
+        pipeline = Pipeline(inlets['eeg'], inlets['gyro'], inlets['accel'],
+                            StreamingFeatures(FS, WINDOW_SIZE, inlets['eeg'].n_channels, hop_size=HOP_SIZE),
+                            model, Debouncer(DEBOUNCE_SECONDS, FS, HOP_SIZE), tello, ACTIONS, engine)
+        start = time.perf_counter()
+        pipeline.start()
+        while not all(inlet.exhausted for inlet in inlets.values()):
+            time.sleep(0.05)
+        time.sleep(0.5)  # Let the last commands go out
+        elapsed = time.perf_counter() - start
+        pipeline.stop()
+        tello.close()
+        commands = [(at, command) for at, command in mock.commands if command.startswith('flip')]
+
+    stats = pipeline.latency()
+    results = {'elapsed_s': elapsed, 'eeg_samples_per_s': inlets['eeg'].total / elapsed,
+               'flips': len(commands), 'counters': stats['counters'], 'stages': stats['timers']}
+
+    if speed and len(onsets):
+        clock = inlets['eeg']._clock
+        due = [clock.wall_time(t) for t, _ in onsets]
+        latencies, too_soon = [], 0
+        for i, (onset_at, (_, label)) in enumerate(zip(due, onsets)):
+            if label not in ACTIONS:
+                continue
+            method, args = ACTIONS[label]
+            expected = ' '.join((method,) + args)  # e.g. 'flip l', as Tello sends it
+            next_onset = due[i + 1] if i + 1 < len(due) else np.inf
+            for at, command in commands:
+                if command != expected or not onset_at <= at < next_onset:
+                    continue
+                if at - onset_at < DEBOUNCE_SECONDS:
+                    too_soon += 1  # Decided before the hold could pass, so not caused by this onset
+                    continue
+                latencies.append(at - onset_at)
+                break
+        results['onset_to_command'] = summary(latencies)
+        results['onset_to_command']['onsets'] = len(onsets)
+        results['onset_to_command']['before_hold'] = too_soon
+        results['debounce_hold_ms'] = DEBOUNCE_SECONDS * 1000
+    return results
+
+
+def _print(results, indent='  '):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            if 'p50_ms' in value:
+                print(f"{indent}{key:>22}: p50 {value['p50_ms']:8.3f} ms  p99 {value['p99_ms']:8.3f} ms"
+                      f"  n={value['count']}")
+            else:
+                print(f"{indent}{key}:")
+                _print(value, indent + '  ')
+        elif isinstance(value, float):
+            print(f"{indent}{key:>22}: {value:,.1f}")
+        else:
+            print(f"{indent}{key:>22}: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", default="synthetic", help="synthetic, a CSV like data/eeg_data.csv, or a .rec")
+    parser.add_argument("--seconds", type=float, default=30, help="length of workload used (0 = all of it)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="end-to-end replay speed; 0 replays as fast as possible (no onset latency)")
+    parser.add_argument("--skip-end-to-end", action="store_true", help="only run the per-stage benchmarks")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    session, onsets = load_workload(args.workload, args.seconds)
+    model = FusedSVM.load('model/svm_model.npz')
+    eeg = np.asarray(session['eeg'].samples, dtype=np.float64)
+
+    results = {'workload': args.workload, 'eeg_seconds': len(eeg) / FS}
+    for name, run in (('features', lambda: bench_features(eeg)),
+                      ('predict', lambda: bench_predict(model, eeg)),
+                      ('imu', lambda: bench_imu(session)),
+                      ('udp', bench_udp)):
+        results[name] = run()
+        print(f"{name}:")
+        _print(results[name])
+    if not args.skip_end_to_end:
+        results['end_to_end'] = bench_end_to_end(session, onsets, model, args.speed or None)
+        print("end_to_end:")
+        _print(results['end_to_end'])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
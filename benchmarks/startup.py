@@ -0,0 +1,68 @@
+"""
+Startup benchmark: time from a cold interpreter to the first prediction.
+
+Each measurement runs in a fresh Python process so that import costs are
+paid every time, the way they are when the controller restarts after a
+crash. LSL stream resolution and the one second it takes to fill the first
+EEG window are not included; those are fixed costs of the headset.
+
+Run from the repository root:
+    python -m benchmarks.startup [--repeat N]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Loads the model the way main.py does, then pushes one synthetic window through
+# the live feature engine and classifier. Prints phase timings as JSON.
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import numpy as np
+from machine_learning.streaming_features import StreamingFeatures
+from machine_learning.fast_svm import FusedSVM
+t_import = time.perf_counter()
+if sys.argv[1] == "npz":
+    model = FusedSVM.load("model/svm_model.npz")
+else:
+    import joblib
+    model = FusedSVM.from_sklearn(joblib.load("model/scaler.pkl"), joblib.load("model/svm_model.pkl"))
+t_load = time.perf_counter()
+features = StreamingFeatures(256)
+window = np.random.default_rng(0).normal(0, 100, (256, 5))
+prediction = model.predict_one(features.push_chunk(window)[0])
+t_predict = time.perf_counter()
+print(json.dumps({"import": t_import - t0, "load": t_load - t_import,
+                  "first_predict": t_predict - t_load, "in_process": t_predict - t0,
+                  "scipy_imported": "scipy" in sys.modules, "sklearn_imported": "sklearn" in sys.modules}))
+'''
+
+
+def run_once(artifact):
+    """Runs one cold start and returns its phase timings, plus total process wall time."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD, artifact],
+                            capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="cold starts per artifact")
+    args = parser.parse_args()
+
+    for artifact in ("npz", "pickle"):
+        runs = [run_once(artifact) for _ in range(args.repeat)]
+        print(f"{artifact}: sklearn imported={runs[0]['sklearn_imported']} scipy imported={runs[0]['scipy_imported']}")
+        for phase in ("import", "load", "first_predict", "in_process", "process"):
+            values = [run[phase] * 1000 for run in runs]
+            print(f"  {phase:>13}: median {statistics.median(values):8.1f} ms  max {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
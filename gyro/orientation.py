@@ -0,0 +1,235 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+MODES = ('complementary', 'madgwick', 'mahony')
+MAX_DT = 0.25  # Longest step integrated in one go (s); longer gaps are stream dropouts
+
+Orientation = namedtuple('Orientation', ['timestamps', 'roll', 'pitch', 'yaw', 'dt'])
+
+
+def accel_angles(accel_samples):
+    """
+    Roll and pitch (degrees) implied by gravity alone, one pair per accelerometer sample.
+    """
+    accel_samples = np.asarray(accel_samples, dtype=np.float64).reshape(-1, 3)
+    ax, ay, az = accel_samples[:, 0], accel_samples[:, 1], accel_samples[:, 2]
+    roll = np.degrees(np.arctan2(ay, az))
+    pitch = np.degrees(np.arctan2(ax, np.hypot(ay, az)))
+    return roll, pitch
+
+
+class OrientationEngine(object):
+    """
+    Head orientation from timestamped gyroscope and accelerometer chunks.
+
+    Every gyroscope sample is integrated over its real time step, taken from
+    the LSL timestamps, and the accelerometer is interpolated onto the
+    gyroscope timestamps, so the two streams may arrive at different rates
+    and in chunks of any size. The state carries over between chunks.
+
+    'complementary' is the original filter, evaluated for a whole chunk at
+    once: roll and pitch are a first-order recursion solved with lfilter and
+    yaw is a cumulative sum. 'madgwick' and 'mahony' fuse through a
+    quaternion and are stepped sample by sample in plain floats, which is
+    much faster than NumPy on scalars. Without a magnetometer, yaw is pure
+    gyro integration in every mode.
+    """
+
+    def __init__(self, mode='complementary', alpha=0.98, beta=0.1, kp=1.0, ki=0.0):
+        """
+        :param mode: One of MODES.
+        :param alpha: Complementary filter coefficient (higher = trust gyro more).
+        :param beta: Madgwick gradient step gain.
+        :param kp: Mahony proportional gain.
+        :param ki: Mahony integral gain.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown orientation mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.alpha = alpha
+        self.beta = beta
+        self.kp = kp
+        self.ki = ki
+        self.reset()
+
+    def reset(self, accel_sample=None, yaw=0.0):
+        """
+        Forgets all history; optionally starts level with gravity at `accel_sample`.
+        """
+        self.roll = 0.0
+        self.pitch = 0.0
+        self.yaw = yaw
+        self.last_timestamp = None
+        self._last_accel = None  # (timestamp, sample) carried into the next chunk
+        self._q = [1.0, 0.0, 0.0, 0.0]
+        self._integral = [0.0, 0.0, 0.0]
+        if accel_sample is not None:
+            roll, pitch = accel_angles(accel_sample)
+            self.roll, self.pitch = float(roll[0]), float(pitch[0])
+            # Stamped once the first chunk arrives, see _accel_at
+            self._last_accel = (None, np.asarray(accel_sample, dtype=np.float64).copy())
+            self._q = _euler_to_quaternion(self.roll, self.pitch, self.yaw)
+
+    def update(self, gyro_samples, gyro_timestamps, accel_samples=(), accel_timestamps=()):
+        """
+        Integrates one chunk.
+
+        :param gyro_samples: (n, 3) angular rates in deg/s.
+        :param gyro_timestamps: (n,) LSL timestamps of the gyroscope samples.
+        :param accel_samples: (m, 3) accelerometer samples; m may differ from n.
+        :param accel_timestamps: (m,) LSL timestamps of the accelerometer samples.
+        :return: Orientation of (n,) arrays, one entry per gyroscope sample, in degrees.
+                 Empty until the first accelerometer sample has arrived.
+        """
+        gyro = np.asarray(gyro_samples, dtype=np.float64).reshape(-1, 3)
+        timestamps = np.asarray(gyro_timestamps, dtype=np.float64)
+        accel = self._accel_at(timestamps, accel_samples, accel_timestamps)
+        if accel is None or not len(gyro):
+            if len(timestamps):
+                self.last_timestamp = timestamps[-1]
+            empty = np.empty(0)
+            return Orientation(empty, empty, empty, empty, empty)
+
+        previous = timestamps[0] if self.last_timestamp is None else self.last_timestamp
+        dt = np.diff(timestamps, prepend=previous)
+        np.clip(dt, 0.0, MAX_DT, out=dt)
+        self.last_timestamp = timestamps[-1]
+
+        if self.mode == 'complementary':
+            roll, pitch, yaw = self._complementary(gyro, accel, dt)
+        else:
+            roll, pitch, yaw = self._quaternion_filter(gyro, accel, dt)
+        self.roll, self.pitch, self.yaw = float(roll[-1]), float(pitch[-1]), float(yaw[-1])
+        return Orientation(timestamps, roll, pitch, yaw, dt)
+
+    def _accel_at(self, timestamps, accel_samples, accel_timestamps):
+        """Accelerometer interpolated onto `timestamps`, holding the last reading past either end."""
+        accel = np.asarray(accel_samples, dtype=np.float64).reshape(-1, 3)
+        accel_timestamps = np.asarray(accel_timestamps, dtype=np.float64)
+        if self._last_accel is not None:
+            last_timestamp, last_sample = self._last_accel
+            if last_timestamp is None:
+                # A baseline reading holds until the first stamped one
+                starts = [t[0] for t in (timestamps, accel_timestamps) if len(t)]
+                last_timestamp = min(starts) if starts else 0.0
+            accel = np.concatenate([last_sample[np.newaxis], accel])
+            accel_timestamps = np.concatenate([[last_timestamp], accel_timestamps])
+        if not len(accel):
+            return None
+        self._last_accel = (accel_timestamps[-1], accel[-1].copy())
+        if len(accel) == 1:
+            return np.broadcast_to(accel[0], (len(timestamps), 3))
+        return np.column_stack([np.interp(timestamps, accel_timestamps, accel[:, axis]) for axis in range(3)])
+
+    def _complementary(self, gyro, accel, dt):
+        from scipy.signal import lfilter
+
+        alpha = self.alpha
+        accel_roll, accel_pitch = accel_angles(accel)
+        # angle[n] = alpha * (angle[n-1] + rate[n] * dt[n]) + (1 - alpha) * accel_angle[n]
+        drive = alpha * gyro[:, :2] * dt[:, np.newaxis]
+        drive[:, 0] += (1 - alpha) * accel_roll
+        drive[:, 1] += (1 - alpha) * accel_pitch
+        initial = alpha * np.array([[self.roll, self.pitch]])
+        angles, _ = lfilter([1.0], [1.0, -alpha], drive, axis=0, zi=initial)
+        yaw = self.yaw + np.cumsum(gyro[:, 2] * dt)
+        return angles[:, 0], angles[:, 1], yaw
+
+    def _quaternion_filter(self, gyro, accel, dt):
+        step = _madgwick_step if self.mode == 'madgwick' else _mahony_step
+        gain = (self.beta,) if self.mode == 'madgwick' else (self.kp, self.ki, self._integral)
+        q = self._q
+        n = len(gyro)
+        quaternions = np.empty((n, 4))
+        rates = np.radians(gyro).tolist()
+        accel = accel.tolist()
+        dt = dt.tolist()
+        for i in range(n):
+            q = step(q, rates[i], accel[i], dt[i], *gain)
+            quaternions[i] = q
+        self._q = q
+
+        w, x, y, z = quaternions.T
+        roll = np.degrees(np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y)))
+        pitch = np.degrees(np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0)))
+        yaw = np.degrees(np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z)))
+        # Keep yaw continuous across +-180 like the complementary filter's
+        yaw = np.degrees(np.unwrap(np.radians(np.concatenate([[self.yaw], yaw]))))[1:]
+        return roll, pitch, yaw
+
+
+def _euler_to_quaternion(roll, pitch, yaw):
+    cr, sr = math.cos(math.radians(roll) / 2), math.sin(math.radians(roll) / 2)
+    cp, sp = math.cos(math.radians(pitch) / 2), math.sin(math.radians(pitch) / 2)
+    cy, sy = math.cos(math.radians(yaw) / 2), math.sin(math.radians(yaw) / 2)
+    return [cr * cp * cy + sr * sp * sy,
+            sr * cp * cy - cr * sp * sy,
+            cr * sp * cy + sr * cp * sy,
+            cr * cp * sy - sr * sp * cy]
+
+
+def _normalized(q):
+    norm = math.sqrt(sum(c * c for c in q))
+    return [c / norm for c in q]
+
+
+def _integrate(q, gx, gy, gz, dt, correction=(0.0, 0.0, 0.0, 0.0)):
+    """q + (0.5 * q * (0, g) - correction) * dt, normalised."""
+    w, x, y, z = q
+    dw = 0.5 * (-x * gx - y * gy - z * gz) - correction[0]
+    dx = 0.5 * (w * gx + y * gz - z * gy) - correction[1]
+    dy = 0.5 * (w * gy - x * gz + z * gx) - correction[2]
+    dz = 0.5 * (w * gz + x * gy - y * gx) - correction[3]
+    return _normalized([w + dw * dt, x + dx * dt, y + dy * dt, z + dz * dt])
+
+
+def _madgwick_step(q, rate, accel, dt, beta):
+    """One IMU-only Madgwick update; `rate` in rad/s."""
+    gx, gy, gz = rate
+    ax, ay, az = accel
+    norm = math.sqrt(ax * ax + ay * ay + az * az)
+    if norm == 0.0:
+        return _integrate(q, gx, gy, gz, dt)
+    ax, ay, az = ax / norm, ay / norm, az / norm
+    w, x, y, z = q
+
+    # Gradient of the gravity error function
+    f1 = 2 * (x * z - w * y) - ax
+    f2 = 2 * (w * x + y * z) - ay
+    f3 = 2 * (0.5 - x * x - y * y) - az
+    s0 = -2 * y * f1 + 2 * x * f2
+    s1 = 2 * z * f1 + 2 * w * f2 - 4 * x * f3
+    s2 = -2 * w * f1 + 2 * z * f2 - 4 * y * f3
+    s3 = 2 * x * f1 + 2 * y * f2
+    s_norm = math.sqrt(s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3)
+    if s_norm == 0.0:
+        return _integrate(q, gx, gy, gz, dt)
+    scale = beta / s_norm
+    return _integrate(q, gx, gy, gz, dt, (s0 * scale, s1 * scale, s2 * scale, s3 * scale))
+
+
+def _mahony_step(q, rate, accel, dt, kp, ki, integral):
+    """One IMU-only Mahony update; `rate` in rad/s, `integral` is updated in place."""
+    gx, gy, gz = rate
+    ax, ay, az = accel
+    norm = math.sqrt(ax * ax + ay * ay + az * az)
+    if norm != 0.0:
+        ax, ay, az = ax / norm, ay / norm, az / norm
+        w, x, y, z = q
+        # Gravity direction predicted by the current estimate
+        vx = 2 * (x * z - w * y)
+        vy = 2 * (w * x + y * z)
+        vz = w * w - x * x - y * y + z * z
+        ex = ay * vz - az * vy
+        ey = az * vx - ax * vz
+        ez = ax * vy - ay * vx
+        if ki > 0.0:
+            integral[0] += ki * ex * dt
+            integral[1] += ki * ey * dt
+            integral[2] += ki * ez * dt
+        gx += kp * ex + integral[0]
+        gy += kp * ey + integral[1]
+        gz += kp * ez + integral[2]
+    return _integrate(q, gx, gy, gz, dt)
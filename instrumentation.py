@@ -0,0 +1,238 @@
+import math
+import os
+import sys
+import threading
+import time
+
+# Set to 0 to turn all recording into a single attribute check
+ENV_VAR = 'MG_METRICS'
+
+
+class Histogram(object):
+    """
+    Latency histogram with logarithmic buckets.
+
+    Memory is fixed and add() is O(1), so it can stay on for a whole session;
+    percentiles are exact to within one bucket (about 12%). Each histogram is
+    meant to be written by one thread; snapshots from other threads may be a
+    sample behind.
+    """
+    MIN_SECONDS = 1e-7
+    BUCKETS_PER_DECADE = 20
+    N_BUCKETS = 9 * BUCKETS_PER_DECADE + 2  # 100 ns .. 100 s, plus under- and overflow
+
+    def __init__(self):
+        self.counts = [0] * self.N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """Records one measurement, in seconds."""
+        if seconds <= self.MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = min(int(math.log10(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_DECADE) + 1,
+                         self.N_BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def _upper_edge(self, bucket):
+        return self.MIN_SECONDS * 10 ** (bucket / self.BUCKETS_PER_DECADE)
+
+    def mark(self):
+        """Current state, to pass to snapshot(since=...) later."""
+        # add() bumps the bucket first, so reading count first never counts a
+        # measurement whose bucket is missing from the copy
+        count, total = self.count, self.total
+        return list(self.counts), count, total
+
+    def snapshot(self, since=None, until=None):
+        """
+        Returns count, mean, p50, p99 and max (in milliseconds).
+
+        :param since: A mark(); only measurements added after it are summarised,
+                      and max becomes the upper edge of the highest bucket hit.
+        :param until: A later mark() to summarise up to, instead of now.
+        """
+        counts, count, total = until if until is not None else self.mark()
+        if since is not None:
+            counts = [now - then for now, then in zip(counts, since[0])]
+            count, total = count - since[1], total - since[2]
+        # Marks taken during an add() on another thread can disagree by a sample
+        hits = sum(counts)
+        if count <= 0 or hits <= 0:
+            return {'count': 0}
+
+        highest = max(i for i, c in enumerate(counts) if c)
+        largest = self.max if since is None else min(self._upper_edge(highest), self.max)
+        result = {'count': count, 'mean_ms': 1000 * total / count}
+        for name, q in (('p50_ms', 0.50), ('p99_ms', 0.99)):
+            rank, seen = q * hits, 0
+            for bucket, c in enumerate(counts):
+                seen += c
+                if seen >= rank:
+                    # Geometric middle of the bucket, never beyond the largest value seen
+                    middle = self._upper_edge(bucket - 0.5) if bucket else self.MIN_SECONDS
+                    result[name] = 1000 * min(middle, largest)
+                    break
+        result['max_ms'] = 1000 * largest
+        return result
+
+
+class _Timer(object):
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.add(time.perf_counter() - self.start)
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics(object):
+    """
+    Named per-stage timers and counters for the live loop.
+
+    Stages record into histograms by name (e.g. 'features', 'predict',
+    'command') and events bump counters (e.g. 'udp.timeouts'). When disabled,
+    record(), count() and timer() return after one attribute check.
+    """
+    def __init__(self, enabled=None):
+        """
+        :param enabled: Defaults to on unless the MG_METRICS environment variable is '0'.
+        """
+        self.enabled = os.environ.get(ENV_VAR, '1') != '0' if enabled is None else enabled
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        """The histogram called `name`, created on first use."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def record(self, name, seconds):
+        """Adds one duration (in seconds) to stage `name`."""
+        if self.enabled:
+            self.histogram(name).add(seconds)
+
+    def timer(self, name):
+        """Context manager timing its body into stage `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name))
+
+    def count(self, name, n=1):
+        """Adds `n` to counter `name`."""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def mark(self):
+        """Current state of everything, to pass to snapshot(since=...) later."""
+        with self._lock:
+            return ({name: h.mark() for name, h in self.histograms.items()}, dict(self.counters))
+
+    def snapshot(self, since=None, until=None):
+        """
+        Returns {'timers': {stage: histogram snapshot}, 'counters': {name: value}}.
+
+        :param since: A mark(); summarises only what happened after it.
+        :param until: A later mark() to summarise up to, instead of now.
+        """
+        with self._lock:
+            histograms = dict(self.histograms)
+        marks, counters = until if until is not None else self.mark()
+        before, previous = since if since is not None else ({}, {})
+        before = dict(before)
+        timers = {}
+        for name in sorted(marks):
+            if since is not None and name not in before:
+                before[name] = ([0] * Histogram.N_BUCKETS, 0, 0.0)  # Stage first seen after `since`
+            timers[name] = histograms[name].snapshot(before.get(name), marks[name])
+        return {'timers': timers,
+                'counters': {name: value - previous.get(name, 0) for name, value in sorted(counters.items())}}
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+
+metrics = Metrics()  # Shared by the pipeline, the scheduler and the Tello client
+
+
+def format_snapshot(snapshot):
+    """One line per stage plus a line of counters, for terminals and logs."""
+    lines = []
+    for name, stats in snapshot['timers'].items():
+        if stats['count']:
+            lines.append(f"  {name:>14}: p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms"
+                         f"  max {stats['max_ms']:8.3f} ms  n={stats['count']}")
+    counters = '  '.join(f'{name}={value}' for name, value in snapshot['counters'].items() if value)
+    if counters:
+        lines.append(f"  {counters}")
+    return '\n'.join(lines)
+
+
+class Reporter(threading.Thread):
+    """
+    Prints what happened in each interval, instead of printing on every sample.
+    """
+    def __init__(self, metrics=metrics, interval=5.0, status=None, stream=None):
+        """
+        :param metrics: Metrics to report.
+        :param interval: Seconds between reports.
+        :param status: Optional callable returning a one-line status put at the top of each report.
+        :param stream: File to write to; defaults to stdout.
+        """
+        super().__init__(daemon=True, name='metrics-reporter')
+        self.metrics = metrics
+        self.interval = interval
+        self.status = status
+        self.stream = stream
+        self._stop_event = threading.Event()
+
+    def report(self, since=None):
+        """Writes one report and returns the mark it was taken at."""
+        mark = self.metrics.mark()
+        lines = [self.status()] if self.status is not None else []
+        body = format_snapshot(self.metrics.snapshot(since, mark))
+        if body:
+            lines.append(body)
+        stream = self.stream or sys.stdout
+        stream.write('\n'.join(lines) + '\n')
+        stream.flush()
+        return mark
+
+    def run(self):
+        since = self.metrics.mark()
+        while not self._stop_event.wait(self.interval):
+            since = self.report(since)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,78 @@
+import numpy as np
+from pylsl import StreamInlet
+
+# pylsl channel_format codes -> NumPy dtypes (string streams are not supported)
+CHANNEL_FORMATS = {
+    1: np.float32,  # cf_float32
+    2: np.float64,  # cf_double64
+    4: np.int32,    # cf_int32
+    5: np.int16,    # cf_int16
+    6: np.int8,     # cf_int8
+    7: np.int64,    # cf_int64
+}
+
+
+class ChunkedInlet(object):
+    """
+    Pulls LSL samples in chunks straight into a preallocated NumPy buffer.
+
+    Each pull costs one call into liblsl regardless of how many samples are
+    waiting, instead of one blocking call and one list per sample.
+    """
+
+    def __init__(self, stream, max_samples=1024):
+        """
+        @param[in] stream: StreamInfo (e.g. from resolve_stream) or an open StreamInlet.
+        @param[in] max_samples: Largest number of samples returned by one pull.
+        """
+        self.inlet = stream if isinstance(stream, StreamInlet) else StreamInlet(stream)
+        info = self.inlet.info()
+        channel_format = info.channel_format()
+        if channel_format not in CHANNEL_FORMATS:
+            raise ValueError(f"Unsupported LSL channel format: {channel_format}")
+
+        self.name = info.name()
+        self.type = info.type()
+        self.fs = info.nominal_srate()
+        self.n_channels = info.channel_count()
+        self.dtype = np.dtype(CHANNEL_FORMATS[channel_format])
+        self.max_samples = max_samples
+
+        self._data = np.zeros((max_samples, self.n_channels), dtype=self.dtype)
+        self._timestamps = np.zeros(max_samples, dtype=np.float64)
+        self.total = 0  # Samples pulled so far
+        self.last_timestamp = None  # LSL timestamp of the newest sample pulled
+
+    def pull(self, timeout=0.0):
+        """
+        Pulls every sample available now, waiting up to `timeout` seconds for more.
+
+        The returned arrays are views into the inlet's buffers and are
+        overwritten by the next pull; copy them if they need to outlive it.
+
+        @param[in] timeout: Seconds to wait; 0.0 returns immediately.
+        @return (samples, timestamps): (n, n_channels) samples and (n,) LSL timestamps.
+        """
+        _, timestamps = self.inlet.pull_chunk(timeout=timeout, max_samples=self.max_samples,
+                                              dest_obj=self._data)
+        n = len(timestamps)
+        if n:
+            self._timestamps[:n] = timestamps
+            self.total += n
+            self.last_timestamp = self._timestamps[n - 1]
+        return self._data[:n], self._timestamps[:n]
+
+    def pull_sample(self, timeout=None):
+        """
+        Blocks for a single sample, e.g. to take a baseline reading at startup.
+
+        @return (sample, timestamp) as returned by StreamInlet.pull_sample.
+        """
+        if timeout is None:
+            sample, timestamp = self.inlet.pull_sample()
+        else:
+            sample, timestamp = self.inlet.pull_sample(timeout=timeout)
+        if sample is not None:
+            self.total += 1
+            self.last_timestamp = timestamp
+        return sample, timestamp
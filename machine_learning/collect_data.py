@@ -1,7 +1,7 @@
-import numpy as np
-import pandas as pd
-from pylsl import StreamInlet, resolve_streams, resolve_byprop
+from pylsl import resolve_streams, resolve_byprop
 from eeg_helpers import resolve_stream
+from chunked_inlet import ChunkedInlet
+from eeg_store import EEGWriter
 import time
 from tqdm import tqdm
 
@@ -10,29 +10,48 @@ from tqdm import tqdm
 CLASS_LABELS = {0: "Left", 1: "Right", 2: "Open"}  # Update with real classes
 SAMPLE_DURATION = 30  # Duration to collect per class (seconds)
 FS = 256  # Sampling rate (adjust based on your EEG device)
+PULL_TIMEOUT = 0.1  # Longest wait for new EEG samples (seconds)
+FLUSH_INTERVAL = 5.0  # Seconds of recording a crash can lose at most
+PROGRESS_INTERVAL = 0.5  # Seconds between progress bar updates
+STORE_PATH = "data/eeg_data"  # Columnar store read by train_model.py
 
 # Resolve EEG stream
 print("Looking for EEG stream...")
 streams = resolve_stream('type', 'EEG')
-inlet = StreamInlet(streams[0])
+inlet = ChunkedInlet(streams[0])
 
-data = []
+writer = EEGWriter(STORE_PATH, inlet.n_channels, FS)  # Chunks go to disk as they arrive
 
 def collect_data(label, duration):
     print(f"Collecting data for: {CLASS_LABELS[label]}")
-    start_time = time.time()
+    # Samples that queued up while waiting for Enter belong to no class
+    while len(inlet.pull(timeout=0.0)[0]):
+        pass
+    start_time = last_flush = last_progress = time.monotonic()
+    labelled = False
     with tqdm(total=duration, desc=f"Recording {CLASS_LABELS[label]}", unit="s") as pbar:
-        while time.time() - start_time < duration:
-            sample, timestamp = inlet.pull_sample()
-            data.append(sample + [label])  # Append EEG values with class label
-            elapsed_time = time.time() - start_time
-            pbar.update(int(elapsed_time - pbar.n))
+        now = start_time
+        while now - start_time < duration:
+            samples, timestamps = inlet.pull(timeout=PULL_TIMEOUT)
+            if len(samples):
+                if not labelled:
+                    writer.set_label(label, timestamps[0])  # One event per class, not a label per row
+                    labelled = True
+                writer.append(samples, timestamps)  # EEG values with their LSL timestamps
+            now = time.monotonic()
+            if now - last_flush >= FLUSH_INTERVAL:
+                writer.flush(fsync=True)
+                last_flush = now
+            if now - last_progress >= PROGRESS_INTERVAL:
+                pbar.update(min(now - start_time, duration) - pbar.n)
+                last_progress = now
+        pbar.update(duration - pbar.n)
 
-for class_id in CLASS_LABELS:
-    input(f"\nPress Enter to record {CLASS_LABELS[class_id]}...")
-    collect_data(class_id, SAMPLE_DURATION)
-
-# Save to CSV
-df = pd.DataFrame(data)
-df.to_csv("data/eeg_data.csv", index=False)
-print("Data collection complete! Saved as eeg_data.csv.")
+try:
+    for class_id in CLASS_LABELS:
+        input(f"\nPress Enter to record {CLASS_LABELS[class_id]}...")
+        collect_data(class_id, SAMPLE_DURATION)
+        writer.flush(fsync=True)  # Everything recorded so far survives a crash in the next class
+finally:
+    writer.close()  # Also keeps what was recorded before Ctrl+C or an error
+print(f"Data collection complete! Saved {writer.rows} samples to {STORE_PATH}.")
@@ -0,0 +1,52 @@
+import math
+
+
+class Debouncer(object):
+    """
+    Fires a class only after it has been predicted continuously for a set time.
+
+    The hold time is stated in seconds of EEG rather than in predictions, so
+    the drone reacts after the same amount of sustained thought whatever the
+    prediction hop is.
+    """
+
+    def __init__(self, seconds, fs, hop_size=1, classes=(0, 1)):
+        """
+        @param[in] seconds: How long a class must be held before it fires.
+        @param[in] fs: Sampling frequency of the EEG stream.
+        @param[in] hop_size: EEG samples between consecutive predictions.
+        @param[in] classes: Classes that can fire; any other prediction resets the run.
+        """
+        self.seconds = seconds
+        self.classes = tuple(classes)
+        # Predictions in a row needed to cover `seconds` of EEG
+        self.required = max(1, math.ceil(round(seconds * fs / hop_size, 9)))
+        self.current = None
+        self.count = 0
+
+    def reset(self):
+        """Forgets the current run."""
+        self.current = None
+        self.count = 0
+
+    def update(self, prediction):
+        """
+        Records one prediction.
+
+        @param[in] prediction: Predicted class label.
+        @return The class to act on once its run is long enough, otherwise None.
+        """
+        if prediction not in self.classes:
+            self.reset()
+            return None
+
+        if prediction == self.current:
+            self.count += 1
+        else:
+            self.current = prediction
+            self.count = 1
+
+        if self.count >= self.required:
+            self.reset()  # Reset count after triggering
+            return prediction
+        return None
@@ -0,0 +1,237 @@
+"""
+Columnar on-disk storage for collected EEG.
+
+A store is a directory holding one standard .npy file per column, e.g.
+
+    data/eeg_data/
+        meta.json       sampling rate and column list
+        eeg.npy         (n, n_channels) float32
+        timestamps.npy  (n,) float64 LSL timestamps
+        events.npy      (index, timestamp, label) records, one per label change
+
+Labels are stored as events rather than repeated on every row; labels_at()
+looks them up for any rows.
+
+Columns are appended in chunks while recording. Each .npy header has a
+fixed size and is rewritten in place on every flush, so the files are
+always valid up to the last flush. Readers memory-map them, so training on
+a multi-hour session never loads it into RAM.
+
+Convert an old CSV (EEG columns, then the label) from the repository root:
+    python -m machine_learning.eeg_store data/eeg_data.csv data/eeg_data
+"""
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+META_FILE = 'meta.json'
+HEADER_SIZE = 192  # Bytes; fixed so the header can be rewritten in place as rows are added
+EVENT_DTYPE = np.dtype([('index', '<i8'), ('timestamp', '<f8'), ('label', '<i2')])
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def _npy_header(dtype, shape):
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape})
+    padding = HEADER_SIZE - len(_NPY_MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError(f"Shape {shape} does not fit in a {HEADER_SIZE} byte .npy header")
+    header = header + ' ' * padding + '\n'
+    return _NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+class NpyAppender(object):
+    """
+    A .npy file that grows along its first axis.
+    """
+
+    def __init__(self, path, dtype, row_shape=()):
+        """
+        @param[in] path: File to create (overwritten if it exists).
+        @param[in] dtype: Element dtype.
+        @param[in] row_shape: Shape of one row, () for a 1-D column.
+        """
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.rows = 0
+        self._file = open(path, 'wb')
+        self._file.write(_npy_header(self.dtype, (0,) + self.row_shape))
+
+    def append(self, rows):
+        """
+        @param[in] rows: (n,) + row_shape values, cast to the column dtype.
+        """
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        if rows.shape[1:] != self.row_shape:
+            raise ValueError(f"Expected rows of shape {self.row_shape}, got {rows.shape[1:]}")
+        self._file.write(rows.tobytes())
+        self.rows += len(rows)
+
+    def flush(self, fsync=False):
+        """Makes every appended row part of the file, rewriting the header in place."""
+        self._file.flush()
+        end = self._file.tell()
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, (self.rows,) + self.row_shape))
+        self._file.seek(end)
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+class EEGWriter(object):
+    """
+    Appends timestamped EEG chunks and label changes to a store while recording.
+    """
+
+    def __init__(self, path, n_channels, fs, dtype=np.float32):
+        """
+        @param[in] path: Store directory, created if needed; existing columns are overwritten.
+        @param[in] n_channels: EEG channels per sample.
+        @param[in] fs: Sampling frequency.
+        @param[in] dtype: On-disk EEG dtype.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.columns = {
+            'eeg': NpyAppender(os.path.join(path, 'eeg.npy'), dtype, (n_channels,)),
+            'timestamps': NpyAppender(os.path.join(path, 'timestamps.npy'), np.float64),
+        }
+        self.events = NpyAppender(os.path.join(path, 'events.npy'), EVENT_DTYPE)
+        self.label = None
+        with open(os.path.join(path, META_FILE), 'w') as f:
+            json.dump({'fs': fs, 'n_channels': n_channels, 'columns': list(self.columns)}, f)
+
+    @property
+    def rows(self):
+        return self.columns['eeg'].rows
+
+    def set_label(self, label, timestamp=np.nan):
+        """
+        Labels every row appended from now on, until the next set_label.
+
+        @param[in] label: Class label.
+        @param[in] timestamp: LSL time the label took effect, if known.
+        """
+        if label == self.label:
+            return
+        self.label = label
+        event = np.array([(self.rows, timestamp, label)], dtype=EVENT_DTYPE)
+        self.events.append(event)
+
+    def append(self, samples, timestamps=None):
+        """
+        @param[in] samples: (n, n_channels) EEG chunk, labelled by the last set_label.
+        @param[in] timestamps: (n,) LSL timestamps; NaN when not known.
+        """
+        self.columns['eeg'].append(samples)
+        self.columns['timestamps'].append(np.full(len(samples), np.nan) if timestamps is None else timestamps)
+
+    def flush(self, fsync=False):
+        """
+        Makes everything appended so far durable; the events go last so they never
+        point past the rows on disk.
+        """
+        for column in self.columns.values():
+            column.flush(fsync)
+        self.events.flush(fsync)
+
+    def close(self):
+        for column in self.columns.values():
+            column.close()
+        self.events.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_store(path):
+    """
+    Memory-maps every column of a store.
+
+    @param[in] path: Store directory written by EEGWriter.
+    @return (columns, meta): dict of column name -> read-only memmap, and the meta.json contents.
+            All columns are cut to the length of the shortest, in case a
+            recording stopped between flushing one column and the next.
+            The label events are under 'events'.
+    """
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    columns = {name: _load_column(os.path.join(path, f'{name}.npy')) for name in meta['columns']}
+    n = min(len(column) for column in columns.values())
+    columns = {name: column[:n] for name, column in columns.items()}
+    columns['events'] = _load_column(os.path.join(path, 'events.npy'))
+    return columns, meta
+
+
+def _load_column(path):
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        return np.load(path)  # Empty columns cannot be memory-mapped
+
+
+def labels_at(columns, rows):
+    """
+    Labels of the given rows, looked up in the label events.
+
+    @param[in] columns: As returned by load_store.
+    @param[in] rows: Row indices, ascending or not.
+    @return int16 array like `rows`; -1 for rows before the first label.
+    """
+    rows = np.asarray(rows)
+    events = columns['events']
+    which = np.searchsorted(events['index'], rows, side='right') - 1
+    labels = np.asarray(events['label'], dtype=np.int16)[np.maximum(which, 0)] if len(events) else np.zeros(len(rows), np.int16)
+    labels[which < 0] = -1
+    return labels
+
+
+def csv_to_store(csv_path, path, fs, chunksize=65536):
+    """
+    Converts a collect_data CSV (EEG columns, label last) without loading it whole.
+
+    @return Number of rows written.
+    """
+    import pandas as pd  # Only needed for the conversion
+
+    writer = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        values = chunk.to_numpy()
+        if writer is None:
+            writer = EEGWriter(path, values.shape[1] - 1, fs)
+        # Rows of one chunk can carry different labels, so write label runs separately
+        labels = values[:, -1].astype(np.int16)
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(labels)) + 1, [len(labels)]])
+        for start, stop in zip(starts[:-1], starts[1:]):
+            writer.set_label(labels[start])
+            writer.append(values[start:stop, :-1])  # The CSV has no timestamps
+    if writer is None:
+        raise ValueError(f"{csv_path} has no rows")
+    writer.close()
+    return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help="CSV written by collect_data")
+    parser.add_argument("store", help="store directory to create")
+    parser.add_argument("--fs", type=float, default=256, help="sampling frequency of the recording")
+    args = parser.parse_args()
+    rows = csv_to_store(args.csv, args.store, args.fs)
+    print(f"Wrote {rows} samples to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import numpy as np
+
+ARTIFACT_VERSION = 1  # Bumped whenever the .npz layout changes
+
+
+class FusedSVM(object):
+    """
+    StandardScaler + RBF SVC prediction folded into a single NumPy evaluation.
+
+    The scaler is folded into the support vectors once, since
+    ||(x - mean) / scale - sv||^2 == sum(((x - (mean + sv * scale)) / scale)^2),
+    so raw feature vectors go straight into the kernel. The one-vs-one votes
+    are then cast exactly the way libsvm casts them. Built once at startup;
+    single-row predictions reuse preallocated buffers and skip sklearn's
+    input validation entirely.
+    """
+
+    def __init__(self, mean, scale, support_vectors, dual_coef, intercept, n_support, classes, gamma):
+        """
+        @param[in] mean: Scaler mean_, (n_features,).
+        @param[in] scale: Scaler scale_, (n_features,).
+        @param[in] support_vectors: SVC support_vectors_ in scaled space, (n_sv, n_features).
+        @param[in] dual_coef: libsvm-ordered dual coefficients, (n_classes - 1, n_sv).
+        @param[in] intercept: libsvm-ordered intercepts (-rho), one per class pair.
+        @param[in] n_support: Support vectors per class, in class order.
+        @param[in] classes: Class labels.
+        @param[in] gamma: RBF kernel coefficient.
+        """
+        mean = np.asarray(mean, dtype=np.float64)
+        scale = np.asarray(scale, dtype=np.float64)
+        support_vectors = np.asarray(support_vectors, dtype=np.float64)
+        dual_coef = np.asarray(dual_coef, dtype=np.float64)
+        n_support = np.asarray(n_support, dtype=np.int64)
+
+        self.mean = mean
+        self.scale = scale
+        self.support_vectors = support_vectors
+        self.dual_coef = dual_coef
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.n_support = n_support
+        self.classes = np.asarray(classes)
+        self.gamma = float(gamma)
+
+        # Scaler folded into the support vectors
+        self._folded = mean + support_vectors * scale
+        self._inv_scale_sq = 1.0 / (scale * scale)
+
+        # One weight row per class pair (i, j), i < j, in libsvm's order
+        n_classes = len(self.classes)
+        starts = np.concatenate([[0], np.cumsum(n_support)])
+        pairs = [(i, j) for i in range(n_classes) for j in range(i + 1, n_classes)]
+        self._pair_weights = np.zeros((len(pairs), len(support_vectors)))
+        for p, (i, j) in enumerate(pairs):
+            self._pair_weights[p, starts[i]:starts[i + 1]] = dual_coef[j - 1, starts[i]:starts[i + 1]]
+            self._pair_weights[p, starts[j]:starts[j + 1]] = dual_coef[i, starts[j]:starts[j + 1]]
+        self._pair_first = np.array([i for i, _ in pairs])
+        self._pair_second = np.array([j for _, j in pairs])
+
+        # Preallocated buffers for predict_one
+        self._diff = np.empty_like(self._folded)
+        self._kernel = np.empty(len(support_vectors))
+        self._decision = np.empty(len(pairs))
+
+    @classmethod
+    def from_sklearn(cls, scaler, clf):
+        """
+        Builds the fused model from a fitted StandardScaler and RBF SVC.
+
+        @param[in] scaler: Fitted sklearn.preprocessing.StandardScaler.
+        @param[in] clf: Fitted sklearn.svm.SVC with kernel='rbf'.
+        """
+        if clf.kernel != 'rbf':
+            raise ValueError(f"FusedSVM only supports the rbf kernel, not {clf.kernel!r}")
+        n_features = clf.support_vectors_.shape[1]
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+
+        dual_coef, intercept = clf.dual_coef_, clf.intercept_
+        if len(clf.classes_) == 2:
+            # sklearn flips the sign of binary models; undo it to get libsvm's values
+            dual_coef, intercept = -dual_coef, -intercept
+        return cls(mean, scale, clf.support_vectors_, dual_coef, intercept,
+                   clf.n_support_, clf.classes_, clf._gamma)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a model written by save(); needs neither sklearn nor joblib.
+
+        @param[in] path: Path of the .npz artifact.
+        """
+        with np.load(path, allow_pickle=False) as artifact:
+            if int(artifact['format_version']) != ARTIFACT_VERSION:
+                raise ValueError(f"Unsupported model artifact version in {path}")
+            return cls(artifact['mean'], artifact['scale'], artifact['support_vectors'],
+                       artifact['dual_coef'], artifact['intercept'], artifact['n_support'],
+                       artifact['classes'], artifact['gamma'])
+
+    def save(self, path):
+        """
+        Writes the model as an uncompressed .npz of plain arrays.
+
+        @param[in] path: Destination path, conventionally model/svm_model.npz.
+        """
+        np.savez(path, format_version=ARTIFACT_VERSION, mean=self.mean, scale=self.scale,
+                 support_vectors=self.support_vectors, dual_coef=self.dual_coef,
+                 intercept=self.intercept, n_support=self.n_support, classes=self.classes,
+                 gamma=self.gamma)
+
+    def decision_values(self, feature_vector):
+        """
+        One-vs-one decision values of a single raw (unscaled) feature vector.
+
+        @return (n_pairs,) array, valid until the next call.
+        """
+        np.subtract(self._folded, feature_vector, out=self._diff)
+        np.square(self._diff, out=self._diff)
+        np.dot(self._diff, self._inv_scale_sq, out=self._kernel)
+        self._kernel *= -self.gamma
+        np.exp(self._kernel, out=self._kernel)
+        np.dot(self._pair_weights, self._kernel, out=self._decision)
+        self._decision += self.intercept
+        return self._decision
+
+    def predict_one(self, feature_vector):
+        """
+        Predicts the class of a single raw (unscaled) feature vector.
+
+        @return Class label, the same one scaler.transform + clf.predict gives.
+        """
+        decision = self.decision_values(feature_vector)
+        winners = np.where(decision > 0, self._pair_first, self._pair_second)
+        votes = np.bincount(winners, minlength=len(self.classes))
+        return self.classes[np.argmax(votes)]  # Ties go to the lowest class, like libsvm
+
+    def predict(self, X, batch_size=256):
+        """
+        Predicts the classes of many raw (unscaled) feature vectors.
+
+        @param[in] X: (n, n_features) array.
+        @return (n,) array of class labels.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        labels = np.empty(len(X), dtype=self.classes.dtype)
+        for start in range(0, len(X), batch_size):
+            batch = X[start:start + batch_size]
+            diff = batch[:, np.newaxis, :] - self._folded
+            kernel = np.exp(-self.gamma * (diff * diff) @ self._inv_scale_sq)  # (n, n_sv)
+            decision = kernel @ self._pair_weights.T + self.intercept
+            winners = np.where(decision > 0, self._pair_first, self._pair_second)
+            votes = np.zeros((len(batch), len(self.classes)), dtype=np.int64)
+            np.add.at(votes, (np.arange(len(batch))[:, np.newaxis], winners), 1)
+            labels[start:start + batch_size] = self.classes[np.argmax(votes, axis=1)]
+        return labels
@@ -1,34 +1,93 @@
-from scipy.signal import welch
-from scipy.stats import entropy
+from functools import lru_cache
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
-def extract_features(eeg_window, fs):
+N_CHANNELS = 5  # EEG sensor channels used for features
+BANDS = [(0.5, 4), (4, 8), (8, 13), (13, 30)]  # Delta, theta, alpha, beta (Hz)
+N_CHANNEL_FEATURES = 3 + len(BANDS) + 1  # Mean, std, var, band powers, spectral entropy
+
+@lru_cache(maxsize=None)
+def band_slices(fs, nperseg):
+    """
+    Index ranges of each frequency band in a Welch PSD, computed once per (fs, nperseg).
+
+    @param[in] fs: Sampling frequency.
+    @param[in] nperseg: Welch segment length.
+    @return Tuple of slices selecting low <= f < high for every band in BANDS.
+    """
+    freqs = np.fft.rfftfreq(nperseg, 1 / fs)
+    return tuple(slice(np.searchsorted(freqs, low), np.searchsorted(freqs, high)) for low, high in BANDS)
+
+def sliding_windows(data, window_size, step):
+    """
+    Strided view of every `window_size`-sample window of a recording, without copying.
+
+    @param[in] data: (n_samples, n_channels) array of EEG data.
+    @param[in] window_size: Samples per window.
+    @param[in] step: Samples between window starts; less than window_size overlaps windows.
+    @return (n_windows, window_size, n_channels) read-only view.
+    """
+    windows = sliding_window_view(data, window_size, axis=0)  # (n, n_channels, window_size)
+    return windows[::step].transpose(0, 2, 1)
+
+def extract_features(eeg_window, fs, dtype=np.float32):
     """
     Extracts features from a 256-sample window for each EEG channel.
 
+    All channels go through a single Welch call; the result matches the
+    per-channel computation to within floating point rounding.
+
     @param[in] eeg_window: (256, 5) array containing EEG data.
     @param[in] fs: Sampling frequency.
+    @param[in] dtype: dtype of the returned feature vector.
     @return Feature vector concatenated across all channels.
     """
-    features = []
-    
-    for i in range(5):  # Loop through the 5 EEG sensor channels
-        channel = eeg_window[:, i]        
+    return _window_features(np.asarray(eeg_window)[np.newaxis], fs, dtype)[0]
 
-        freqs, psd = welch(channel, fs=fs, nperseg=min(len(channel), fs))
-        if np.sum(psd) == 0:
-            psd = np.ones_like(psd)  # Prevent divide-by-zero
+def extract_features_batch(eeg_windows, fs, dtype=np.float32, batch_size=1024):
+    """
+    Extracts features from many windows at once, e.g. a sliding_windows() view.
 
-        power_features = [np.sum(psd[(freqs >= low) & (freqs < high)]) for low, high in [(0.5, 4), (4, 8), (8, 13), (13, 30)]]
-        spectral_entropy = entropy(psd / np.sum(psd))
+    Windows are processed `batch_size` at a time so that heavily overlapping
+    views of long recordings never materialize in memory all at once.
 
-        channel_features = [
-            np.mean(channel), np.std(channel), np.var(channel),
-            *power_features, spectral_entropy
-        ]
-        features.extend(channel_features)
+    @param[in] eeg_windows: (n_windows, 256, 5) array containing EEG data.
+    @param[in] fs: Sampling frequency.
+    @param[in] dtype: dtype of the returned feature matrix.
+    @param[in] batch_size: Windows per vectorized pass.
+    @return (n_windows, 40) feature matrix, one extract_features() row per window.
+    """
+    n_windows = len(eeg_windows)
+    features = np.empty((n_windows, N_CHANNELS * N_CHANNEL_FEATURES), dtype=dtype)
+    for start in range(0, n_windows, batch_size):
+        stop = min(start + batch_size, n_windows)
+        features[start:stop] = _window_features(eeg_windows[start:stop], fs, dtype)
+    return features
 
-    # Replace NaN values with 0
-    features = np.nan_to_num(features)
+def _window_features(eeg_windows, fs, dtype):
+    """Features of a (n_windows, n_samples, n_channels) stack, one row per window."""
+    # Imported here so the live loop, which only needs band_slices, starts without scipy
+    from scipy.signal import welch
+    from scipy.stats import entropy
 
-    return features
\ No newline at end of file
+    eeg_windows = np.asarray(eeg_windows, dtype=np.float64)[:, :, :N_CHANNELS]
+    nperseg = min(eeg_windows.shape[1], fs)
+
+    _, psd = welch(eeg_windows, fs=fs, nperseg=nperseg, axis=1)  # (n_windows, n_freqs, 5)
+    psd_sum = psd.sum(axis=1, keepdims=True)
+    if not psd_sum.all():
+        psd = np.where(psd_sum == 0, 1.0, psd)  # Prevent divide-by-zero
+        psd_sum = psd.sum(axis=1, keepdims=True)
+
+    # One row of features per channel, flattened channel by channel
+    features = np.empty((len(eeg_windows), eeg_windows.shape[2], N_CHANNEL_FEATURES), dtype=np.float64)
+    features[:, :, 0] = eeg_windows.mean(axis=1)
+    features[:, :, 2] = eeg_windows.var(axis=1)
+    features[:, :, 1] = np.sqrt(features[:, :, 2])
+    for b, band in enumerate(band_slices(fs, nperseg)):
+        features[:, :, 3 + b] = psd[:, band].sum(axis=1)
+    features[:, :, -1] = entropy(psd / psd_sum, axis=1)
+
+    # Replace NaN values with 0
+    features = np.nan_to_num(features.reshape(len(eeg_windows), -1))
+    return features.astype(dtype, copy=False)
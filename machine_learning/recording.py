@@ -0,0 +1,285 @@
+"""
+Record LSL sessions to a compact binary file and replay them offline.
+
+File layout (little endian):
+    MAGIC
+    uint32 header length, then a JSON header listing the streams
+    chunks: uint8 stream index, uint32 n, n float64 timestamps, n * n_channels samples
+
+Chunks are appended as they are pulled, so a session cut short by a crash
+is still readable up to its last complete chunk.
+
+Record from the repository root:
+    python -m machine_learning.recording out.rec [--seconds N]
+"""
+import argparse
+import json
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b'MGREC\x01\n'
+_HEADER_LENGTH = struct.Struct('<I')
+_CHUNK = struct.Struct('<BI')
+
+# The stream types main.py uses, under the names the recording stores them as
+STREAM_TYPES = {'eeg': 'EEG', 'gyro': 'Gyroscope', 'accel': 'Accelerometer'}
+
+Recording = namedtuple('Recording', ['name', 'type', 'fs', 'samples', 'timestamps'])
+
+
+class SessionRecorder(object):
+    """
+    Appends chunks of several streams to one recording file.
+    """
+
+    def __init__(self, path, inlets):
+        """
+        @param[in] path: Destination file.
+        @param[in] inlets: Dict of stream name -> ChunkedInlet or ReplayInlet.
+        """
+        self.inlets = dict(inlets)
+        self.names = list(self.inlets)
+        self.dtypes = {}
+        streams = []
+        for name, inlet in self.inlets.items():
+            dtype = np.dtype(inlet.dtype)
+            self.dtypes[name] = dtype
+            streams.append({'name': name, 'type': inlet.type, 'fs': inlet.fs,
+                            'n_channels': inlet.n_channels, 'dtype': dtype.str})
+        header = json.dumps({'streams': streams}).encode('utf-8')
+
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+        self.samples_written = {name: 0 for name in self.names}
+
+    def add(self, name, samples, timestamps):
+        """
+        Appends one chunk of stream `name`.
+
+        @param[in] samples: (n, n_channels) samples.
+        @param[in] timestamps: (n,) LSL timestamps.
+        """
+        n = len(timestamps)
+        if not n:
+            return
+        self._file.write(_CHUNK.pack(self.names.index(name), n))
+        self._file.write(np.ascontiguousarray(timestamps, dtype='<f8').tobytes())
+        self._file.write(np.ascontiguousarray(samples, dtype=self.dtypes[name]).tobytes())
+        self.samples_written[name] += n
+
+    def record(self, seconds=None, poll_interval=0.01):
+        """
+        Pulls every inlet until `seconds` have passed (or forever), writing as it goes.
+        """
+        deadline = None if seconds is None else time.monotonic() + seconds
+        while deadline is None or time.monotonic() < deadline:
+            for name, inlet in self.inlets.items():
+                samples, timestamps = inlet.pull(timeout=0.0)
+                self.add(name, samples, timestamps)
+            time.sleep(poll_interval)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_session(path):
+    """
+    Reads a recording back.
+
+    @param[in] path: File written by SessionRecorder.
+    @return Dict of stream name -> Recording with (n, n_channels) samples and (n,) timestamps.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a session recording")
+    offset = len(MAGIC)
+    (header_length,) = _HEADER_LENGTH.unpack_from(data, offset)
+    offset += _HEADER_LENGTH.size
+    streams = json.loads(data[offset:offset + header_length].decode('utf-8'))['streams']
+    offset += header_length
+
+    chunks = [([], []) for _ in streams]
+    while offset + _CHUNK.size <= len(data):
+        index, n = _CHUNK.unpack_from(data, offset)
+        stream = streams[index]
+        dtype = np.dtype(stream['dtype'])
+        end = offset + _CHUNK.size + n * 8 + n * stream['n_channels'] * dtype.itemsize
+        if end > len(data):
+            break  # Truncated final chunk
+        timestamps = np.frombuffer(data, '<f8', n, offset + _CHUNK.size)
+        samples = np.frombuffer(data, dtype, n * stream['n_channels'], offset + _CHUNK.size + n * 8)
+        chunks[index][0].append(timestamps)
+        chunks[index][1].append(samples.reshape(n, stream['n_channels']))
+        offset = end
+
+    session = {}
+    for stream, (timestamps, samples) in zip(streams, chunks):
+        dtype = np.dtype(stream['dtype'])
+        session[stream['name']] = Recording(
+            stream['name'], stream['type'], stream['fs'],
+            np.concatenate(samples) if samples else np.empty((0, stream['n_channels']), dtype),
+            np.concatenate(timestamps) if timestamps else np.empty(0))
+    return session
+
+
+class _ReplayClock(object):
+    """Maps recorded timestamps to wall time; shared so replayed streams stay in step."""
+
+    def __init__(self, origin, speed):
+        self.origin = origin
+        self.speed = speed
+        self.started_at = None
+
+    def now(self):
+        """Latest recorded timestamp that is due, or +inf when replaying as fast as possible."""
+        if not self.speed:
+            return np.inf
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        return self.origin + (time.perf_counter() - self.started_at) * self.speed
+
+    def wall_time(self, timestamp):
+        return self.started_at + (timestamp - self.origin) / self.speed
+
+
+class ReplayInlet(object):
+    """
+    Serves a recorded stream through the ChunkedInlet interface.
+
+    Samples become available when their recorded time comes round again,
+    scaled by the session speed, or all at once when the speed is None.
+    """
+
+    def __init__(self, recording, clock, max_samples=1024):
+        """
+        @param[in] recording: Recording from load_session.
+        @param[in] clock: _ReplayClock shared by the session's inlets.
+        @param[in] max_samples: Largest number of samples returned by one pull.
+        """
+        self.recording = recording
+        self.inlet = self  # Stands in for the StreamInlet (time_correction)
+        self.name = recording.name
+        self.type = recording.type
+        self.fs = recording.fs
+        self.n_channels = recording.samples.shape[1]
+        self.dtype = recording.samples.dtype
+        self.max_samples = max_samples
+        self.total = 0
+        self.last_timestamp = None
+        self._clock = clock
+
+    @property
+    def exhausted(self):
+        """True once every recorded sample has been pulled."""
+        return self.total >= len(self.recording.timestamps)
+
+    def time_correction(self, timeout=None):
+        """Recorded timestamps are already on one clock."""
+        return 0.0
+
+    def _available(self):
+        due = np.searchsorted(self.recording.timestamps, self._clock.now(), side='right')
+        return min(due, self.total + self.max_samples) - self.total
+
+    def pull(self, timeout=0.0):
+        """
+        Returns the samples that are due, waiting up to `timeout` seconds for the next one.
+
+        @return (samples, timestamps) read-only views, like ChunkedInlet.pull.
+        """
+        n = self._available()
+        if n <= 0 and timeout and not self.exhausted:
+            wait = self._clock.wall_time(self.recording.timestamps[self.total]) - time.perf_counter()
+            time.sleep(min(max(wait, 0.0), timeout))
+            n = self._available()
+        n = max(n, 0)
+        start = self.total
+        self.total += n
+        if n:
+            self.last_timestamp = self.recording.timestamps[self.total - 1]
+        samples = self.recording.samples[start:start + n]
+        timestamps = self.recording.timestamps[start:start + n]
+        samples.flags.writeable = False
+        timestamps.flags.writeable = False
+        return samples, timestamps
+
+    def pull_sample(self, timeout=None):
+        """
+        Returns the next sample once it is due, like ChunkedInlet.pull_sample.
+
+        @return (sample, timestamp), or (None, None) on timeout or at the end.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.exhausted:
+            if self._available() > 0:
+                sample = self.recording.samples[self.total].tolist()
+                self.last_timestamp = self.recording.timestamps[self.total]
+                self.total += 1
+                return sample, self.last_timestamp
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            time.sleep(0.001)
+        return None, None
+
+
+def open_replay(path, speed=1.0, max_samples=1024):
+    """
+    Opens a recording for replay.
+
+    @param[in] path: File written by SessionRecorder.
+    @param[in] speed: 1.0 for real time, N for N times real time, None as fast as possible.
+    @param[in] max_samples: Largest number of samples returned by one pull.
+    @return Dict of stream name -> ReplayInlet, all driven by one clock.
+    """
+    return replay_session(load_session(path), speed, max_samples)
+
+
+def replay_session(session, speed=1.0, max_samples=1024):
+    """
+    Like open_replay, for recordings already in memory (e.g. built from a CSV).
+
+    @param[in] session: Dict of stream name -> Recording.
+    """
+    starts = [r.timestamps[0] for r in session.values() if len(r.timestamps)]
+    clock = _ReplayClock(min(starts) if starts else 0.0, speed)
+    return {name: ReplayInlet(recording, clock, max_samples) for name, recording in session.items()}
+
+
+def main():
+    try:
+        from machine_learning.eeg_helpers import resolve_stream
+        from machine_learning.chunked_inlet import ChunkedInlet
+    except ImportError:
+        from eeg_helpers import resolve_stream
+        from chunked_inlet import ChunkedInlet
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="recording to write")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this long (default: Ctrl+C)")
+    args = parser.parse_args()
+
+    inlets = {}
+    for name, stream_type in STREAM_TYPES.items():
+        print(f"Looking for a {stream_type} stream...")
+        inlets[name] = ChunkedInlet(resolve_stream('type', stream_type)[0])
+
+    with SessionRecorder(args.path, inlets) as recorder:
+        try:
+            recorder.record(args.seconds)
+        except KeyboardInterrupt:
+            pass
+        print(f"Recorded {recorder.samples_written} samples to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class RingBuffer(object):
+    """
+    Preallocated sliding window over a multi-channel sample stream.
+
+    Every sample is written twice, at `i` and `i + capacity`, so that any
+    window of the most recent `capacity` samples is one contiguous slice of
+    the backing array and can be handed out as a view without copying.
+    """
+
+    def __init__(self, window_size, n_channels, hop_size=1, capacity=None, dtype=np.float64):
+        """
+        @param[in] window_size: Number of samples in each window.
+        @param[in] n_channels: Number of channels per sample.
+        @param[in] hop_size: Number of new samples between consecutive windows.
+        @param[in] capacity: Number of samples kept; defaults to twice the window
+                             size so a chunk of up to `window_size` samples never
+                             loses a window.
+        @param[in] dtype: Sample dtype of the backing array.
+        """
+        if capacity is None:
+            capacity = 2 * window_size
+        if window_size < 1 or hop_size < 1:
+            raise ValueError("window_size and hop_size must be positive")
+        if capacity < window_size:
+            raise ValueError("capacity must be at least window_size")
+
+        self.window_size = window_size
+        self.n_channels = n_channels
+        self.hop_size = hop_size
+        self.capacity = capacity
+
+        self._data = np.zeros((2 * capacity, n_channels), dtype=dtype)
+        self.total = 0  # Samples pushed since creation (or the last reset)
+        self.dropped_windows = 0  # Windows overwritten before windows() reached them
+        self._next_end = window_size  # Sample count at which the next window completes
+
+    def reset(self):
+        """Forgets all buffered samples; the next window needs a full refill."""
+        self.total = 0
+        self.dropped_windows = 0
+        self._next_end = self.window_size
+
+    @property
+    def is_full(self):
+        """True once at least one full window has been pushed."""
+        return self.total >= self.window_size
+
+    def push(self, sample):
+        """
+        Appends a single sample.
+
+        @param[in] sample: Sequence of `n_channels` values.
+        """
+        i = self.total % self.capacity
+        self._data[i] = sample
+        self._data[i + self.capacity] = sample
+        self.total += 1
+
+    def push_chunk(self, chunk):
+        """
+        Appends a block of samples.
+
+        @param[in] chunk: (n, n_channels) array of samples, oldest first.
+        """
+        chunk = np.asarray(chunk)
+        n = len(chunk)
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the newest `capacity` samples can be kept anyway
+            self.total += n - self.capacity
+            chunk = chunk[-self.capacity:]
+            n = self.capacity
+
+        cap = self.capacity
+        i = self.total % cap
+        first = min(n, cap - i)
+        self._data[i:i + first] = chunk[:first]
+        self._data[i + cap:i + cap + first] = chunk[:first]
+        rest = n - first
+        if rest:
+            self._data[:rest] = chunk[first:]
+            self._data[cap:cap + rest] = chunk[first:]
+        self.total += n
+
+    def _view(self, end):
+        """Read-only view of the window covering samples [end - window_size, end)."""
+        start = (end - self.window_size) % self.capacity
+        view = self._data[start:start + self.window_size]
+        view.flags.writeable = False
+        return view
+
+    def latest(self):
+        """
+        Returns the most recent full window, or None if the buffer is not full yet.
+
+        @return (window_size, n_channels) read-only view, oldest sample first.
+        """
+        if not self.is_full:
+            return None
+        return self._view(self.total)
+
+    def windows(self):
+        """
+        Yields every hop-aligned window completed since the last call.
+
+        The yielded arrays are views into the buffer; they stay valid only until
+        the next push. Windows whose samples were already overwritten are skipped
+        and counted in `dropped_windows`.
+        """
+        oldest_end = self.total - self.capacity + self.window_size
+        if self._next_end < oldest_end:
+            skipped = -(-(oldest_end - self._next_end) // self.hop_size)
+            self.dropped_windows += skipped
+            self._next_end += skipped * self.hop_size
+
+        while self._next_end <= self.total:
+            end = self._next_end
+            self._next_end += self.hop_size
+            yield self._view(end)
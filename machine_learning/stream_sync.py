@@ -0,0 +1,207 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from pylsl.util import LostError, TimeoutError as LSLTimeoutError
+except ImportError:  # pylsl before 1.17
+    from pylsl.pylsl import LostError, TimeoutError as LSLTimeoutError
+
+try:
+    from machine_learning.ring_buffer import RingBuffer
+except ImportError:
+    from ring_buffer import RingBuffer
+
+METHODS = ('linear', 'previous')
+
+SyncedWindow = namedtuple('SyncedWindow', ['timestamps', 'streams', 'stale'])
+
+
+class _History(object):
+    """Recent (timestamp, sample) rows of a secondary stream, on the local clock."""
+
+    def __init__(self, n_channels, max_samples):
+        self.timestamps = np.empty(0)
+        self.samples = np.empty((0, n_channels))
+        self.max_samples = max_samples
+
+    def add(self, samples, timestamps):
+        self.timestamps = np.concatenate([self.timestamps, timestamps])[-self.max_samples:]
+        self.samples = np.concatenate([self.samples, samples])[-self.max_samples:]
+
+    @property
+    def latest(self):
+        return self.timestamps[-1] if len(self.timestamps) else None
+
+    def at(self, timestamps, method):
+        """Samples at `timestamps`, holding the first/last sample outside the buffered range."""
+        if not len(self.timestamps):
+            return np.full((len(timestamps), self.samples.shape[1]), np.nan)
+        if len(self.timestamps) == 1:
+            return np.repeat(self.samples, len(timestamps), axis=0)
+        if method == 'previous':
+            idx = np.searchsorted(self.timestamps, timestamps, side='right') - 1
+            return self.samples[np.clip(idx, 0, len(self.timestamps) - 1)]
+
+        # One searchsorted shared by every channel instead of np.interp per channel
+        idx = np.clip(np.searchsorted(self.timestamps, timestamps), 1, len(self.timestamps) - 1)
+        t0, t1 = self.timestamps[idx - 1], self.timestamps[idx]
+        span = t1 - t0
+        weight = np.divide(timestamps - t0, span, out=np.zeros_like(span), where=span > 0)
+        np.clip(weight, 0.0, 1.0, out=weight)
+        weight = weight[:, np.newaxis]
+        return self.samples[idx - 1] * (1.0 - weight) + self.samples[idx] * weight
+
+
+class StreamSynchronizer(object):
+    """
+    Puts several LSL streams on one clock and hands out matched windows.
+
+    Timestamps of every stream are shifted by that stream's time_correction()
+    offset, so they are all on the local LSL clock. The reference stream
+    (normally EEG) is cut into hop-aligned windows exactly like RingBuffer
+    does; every other stream is resampled onto the timestamps of each
+    reference window. A window is released once every other stream has
+    caught up with its last timestamp, or has fallen more than `max_lag`
+    seconds behind, so a slow or dead stream delays the reference by at most
+    `max_lag` and never blocks it.
+    """
+
+    def __init__(self, inlets, reference, window_size, hop_size=1, buffer_seconds=4.0,
+                 max_lag=0.25, method='linear', correction_interval=5.0):
+        """
+        @param[in] inlets: Dict of stream name -> ChunkedInlet.
+        @param[in] reference: Name of the stream the windows are cut from.
+        @param[in] window_size: Reference samples per window.
+        @param[in] hop_size: Reference samples between consecutive windows.
+        @param[in] buffer_seconds: History kept per stream.
+        @param[in] max_lag: Longest wait (seconds) for a lagging stream before a
+                            window is released with its last known values.
+        @param[in] method: 'linear' interpolates the other streams, 'previous'
+                           takes their latest sample at or before each timestamp.
+        @param[in] correction_interval: Seconds between time_correction() refreshes;
+                                        None measures the offsets only once.
+        """
+        if reference not in inlets:
+            raise ValueError(f"Reference stream {reference!r} is not one of {list(inlets)}")
+        if method not in METHODS:
+            raise ValueError(f"Unknown resampling method {method!r}, expected one of {METHODS}")
+
+        self.inlets = dict(inlets)
+        self.reference = reference
+        self.max_lag = max_lag
+        self.method = method
+        self.correction_interval = correction_interval
+        self.offsets = {name: 0.0 for name in self.inlets}
+        self.stale_windows = 0  # Windows released before every stream caught up
+        self.failed_corrections = 0  # Refreshes that kept the previous offset
+        self._corrected_at = {}
+
+        ref = self.inlets[reference]
+        capacity = max(2 * window_size, int(np.ceil(buffer_seconds * (ref.fs or 1))))
+        # Timestamps ride along as column 0 so each window carries its own clock
+        self._ring = RingBuffer(window_size, ref.n_channels + 1, hop_size, capacity)
+        self._histories = {
+            name: _History(inlet.n_channels, max(2, int(np.ceil(buffer_seconds * (inlet.fs or 1000)))))
+            for name, inlet in self.inlets.items() if name != reference
+        }
+        self._reference_latest = None
+        self._held = None  # Reference window waiting for the other streams
+
+    def refresh_corrections(self, names=None, timeout=1.0):
+        """
+        Measures the streams' clock offsets; the first call can take a moment.
+
+        A stream whose measurement times out or whose source is lost keeps its
+        previous offset and is tried again after the next correction_interval.
+
+        @param[in] names: Streams to measure, default all of them.
+        @param[in] timeout: Seconds allowed per stream.
+        """
+        for name in self.inlets if names is None else names:
+            try:
+                self.offsets[name] = self.inlets[name].inlet.time_correction(timeout=timeout)
+            except (LSLTimeoutError, LostError):
+                self.failed_corrections += 1
+            self._corrected_at[name] = time.monotonic()
+
+    def add(self, name, samples, timestamps):
+        """
+        Buffers a chunk that was already pulled from stream `name`.
+
+        @param[in] samples: (n, n_channels) samples.
+        @param[in] timestamps: (n,) timestamps on that stream's own clock.
+        """
+        if not len(timestamps):
+            return
+        timestamps = np.asarray(timestamps, dtype=np.float64) + self.offsets[name]
+        if name == self.reference:
+            self._ring.push_chunk(np.column_stack([timestamps, samples]))
+            self._reference_latest = timestamps[-1]
+        else:
+            self._histories[name].add(samples, timestamps)
+
+    def refresh_if_due(self, name=None):
+        """
+        Measures the clock offsets on first use and then every correction_interval.
+
+        @param[in] name: Only refresh this stream, e.g. from the thread that pulls
+                         its inlet, so no other thread calls into that inlet.
+        """
+        now = time.monotonic()
+        due = [stream for stream in (self.inlets if name is None else [name])
+               if stream not in self._corrected_at or (
+                   self.correction_interval is not None and
+                   now - self._corrected_at[stream] >= self.correction_interval)]
+        if due:
+            self.refresh_corrections(due)
+
+    def pull(self):
+        """Pulls whatever every inlet has right now, without waiting on any of them."""
+        self.refresh_if_due()
+        for name, inlet in self.inlets.items():
+            samples, timestamps = inlet.pull(timeout=0.0)
+            self.add(name, samples, timestamps)
+
+    def _ready(self, end_timestamp):
+        """None if a stream is still expected to cover `end_timestamp`, else whether any is stale."""
+        stale = False
+        for history in self._histories.values():
+            latest = history.latest
+            if latest is not None and latest >= end_timestamp:
+                continue
+            if self._reference_latest - end_timestamp < self.max_lag:
+                return None
+            stale = True
+        return stale
+
+    def windows(self):
+        """
+        Yields a SyncedWindow for every reference window whose streams are aligned.
+
+        `timestamps` is the (window_size,) local-clock time axis, `streams` maps
+        every stream name to a (window_size, n_channels) array on that axis, and
+        `stale` is True if some stream had to be held at its last value (or is
+        NaN because it never produced a sample). The reference array is a view
+        that stays valid only until the next push.
+        """
+        while True:
+            window = self._held
+            if window is None:
+                window = next(self._ring.windows(), None)
+                if window is None:
+                    return
+            stale = self._ready(window[-1, 0])
+            if stale is None:
+                if self._held is None:
+                    self._held = window.copy()  # The ring may overwrite it before the others catch up
+                return
+            self._held = None
+            self.stale_windows += stale
+
+            timestamps = window[:, 0]
+            streams = {self.reference: window[:, 1:]}
+            for name, history in self._histories.items():
+                streams[name] = history.at(timestamps, self.method)
+            yield SyncedWindow(timestamps, streams, stale)
@@ -0,0 +1,171 @@
+import numpy as np
+
+try:
+    from machine_learning.ml_helpers import N_CHANNELS, N_CHANNEL_FEATURES, band_slices
+    from machine_learning.ring_buffer import RingBuffer
+except ImportError:  # Run as a script from inside machine_learning/
+    from ml_helpers import N_CHANNELS, N_CHANNEL_FEATURES, band_slices
+    from ring_buffer import RingBuffer
+
+# Largest relative difference from extract_features() seen on recorded data is
+# ~3e-13; the float32 output makes anything below ~1e-7 invisible.
+TOLERANCE = 1e-6
+
+
+class StreamingFeatures(object):
+    """
+    Incremental version of ml_helpers.extract_features for a sliding window.
+
+    Keeps running sums for mean/variance and a sliding DFT of the window, so
+    each new sample costs O(1) for the moments and O(n_bins) for the spectrum
+    instead of a full Welch call. The Hann window and constant detrend that
+    Welch applies are folded in when the features are read out. Every
+    `resync_interval` samples the state is recomputed from the raw window to
+    stop rounding errors from accumulating.
+
+    Matches extract_features() to within a relative tolerance of TOLERANCE.
+    Only the single-segment case (window_size <= fs) is supported, which is
+    what the classifier uses.
+    """
+
+    def __init__(self, fs, window_size=None, n_channels=N_CHANNELS, hop_size=1,
+                 resync_interval=None, dtype=np.float32):
+        """
+        @param[in] fs: Sampling frequency.
+        @param[in] window_size: Samples per window; defaults to fs (1 second).
+        @param[in] n_channels: EEG channels to compute features for.
+        @param[in] hop_size: New samples between feature vectors.
+        @param[in] resync_interval: Samples between exact recomputations; defaults to window_size.
+        @param[in] dtype: dtype of the returned feature vectors.
+        """
+        window_size = int(fs) if window_size is None else window_size
+        if window_size > fs:
+            raise ValueError("StreamingFeatures only supports window_size <= fs (one Welch segment)")
+
+        self.fs = fs
+        self.window_size = window_size
+        self.n_channels = n_channels
+        self.hop_size = hop_size
+        self.resync_interval = resync_interval or window_size
+        self.dtype = dtype
+
+        n = window_size
+        self.n_bins = n // 2 + 1
+        self._bands = band_slices(fs, n)
+        # _twiddle[i, k] = exp(-2j*pi*k*i/n); row n is all ones
+        self._twiddle = np.exp(-2j * np.pi * np.outer(np.arange(n + 1), np.arange(self.n_bins)) / n)
+        hann = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n) / n)  # Periodic Hann, as used by Welch
+        self._scale = 1.0 / (fs * np.sum(hann * hann))
+
+        self._buffer = RingBuffer(window_size, n_channels)
+        self._spectrum = np.zeros((self.n_bins, n_channels), dtype=np.complex128)
+        self._shift = np.zeros(n_channels)  # Offset subtracted before summing, for accuracy
+        self._sum = np.zeros(n_channels)
+        self._sum_sq = np.zeros(n_channels)
+        self._since_resync = 0
+        self._next_end = window_size
+
+    def push_chunk(self, chunk):
+        """
+        Adds samples and returns the feature vectors of every window completed.
+
+        @param[in] chunk: (n, n_channels) array of EEG samples, oldest first.
+        @return (n_windows, 40) array, one extract_features() row per hop.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)[:, :self.n_channels]
+        out = []
+        buffer = self._buffer
+        i = 0
+        while i < len(chunk):
+            if not buffer.is_full:
+                take = min(self.window_size - buffer.total, len(chunk) - i)
+                buffer.push_chunk(chunk[i:i + take])
+                i += take
+                if buffer.is_full:
+                    self._resync()
+            else:
+                take = min(self._next_end - buffer.total, len(chunk) - i, self.window_size)
+                self._slide(chunk[i:i + take])
+                i += take
+
+            if buffer.total == self._next_end:
+                out.append(self._features())
+                self._next_end += self.hop_size
+
+        if not out:
+            return np.empty((0, self.n_channels * N_CHANNEL_FEATURES), dtype=self.dtype)
+        return np.array(out, dtype=self.dtype)
+
+    def push(self, sample):
+        """
+        Adds one sample.
+
+        @return Feature vector if this sample completed a window, otherwise None.
+        """
+        features = self.push_chunk(np.asarray(sample, dtype=np.float64)[np.newaxis])
+        return features[0] if len(features) else None
+
+    def _slide(self, new):
+        """Advances the window by len(new) <= window_size samples."""
+        m = len(new)
+        old = self._buffer.latest()[:m]
+        delta = new - old
+
+        self._sum += delta.sum(axis=0)
+        self._sum_sq += ((new - self._shift) ** 2).sum(axis=0) - ((old - self._shift) ** 2).sum(axis=0)
+        # X'_k = e^{2j*pi*k*m/n} * (X_k + sum_i delta_i * e^{-2j*pi*k*i/n})
+        self._spectrum += self._twiddle[:m].T @ delta
+        self._spectrum *= np.conj(self._twiddle[m])[:, np.newaxis]
+
+        self._buffer.push_chunk(new)
+        self._since_resync += m
+        if self._since_resync >= self.resync_interval:
+            self._resync()
+
+    def _resync(self):
+        """Recomputes the running state exactly from the buffered window."""
+        window = self._buffer.latest()
+        self._shift = window.mean(axis=0)
+        centered = window - self._shift
+        self._sum = centered.sum(axis=0)
+        self._sum_sq = (centered * centered).sum(axis=0)
+        self._spectrum = np.fft.rfft(window, axis=0)
+        self._since_resync = 0
+
+    def _features(self):
+        """Feature vector of the current window, laid out like extract_features()."""
+        n = self.window_size
+        mean_offset = self._sum / n
+        var = np.maximum(self._sum_sq / n - mean_offset * mean_offset, 0.0)
+
+        # Constant detrend only touches bin 0; the Hann window mixes each bin
+        # with its neighbours: Y_k = 0.5 Z_k - 0.25 (Z_{k-1} + Z_{k+1})
+        z = np.empty((self.n_bins + 2, self.n_channels), dtype=np.complex128)
+        z[1:-1] = self._spectrum
+        z[1] -= n * (mean_offset + self._shift)
+        z[0] = np.conj(z[2])  # Z_{-1}
+        z[-1] = np.conj(self._spectrum[n - self.n_bins])  # Z_{n_bins}
+        windowed = 0.5 * z[1:-1] - 0.25 * (z[:-2] + z[2:])
+
+        psd = (windowed.real ** 2 + windowed.imag ** 2) * self._scale
+        if n % 2:
+            psd[1:] *= 2
+        else:
+            psd[1:-1] *= 2
+        psd_sum = psd.sum(axis=0)
+        if not psd_sum.all():
+            psd[:, psd_sum == 0] = 1  # Prevent divide-by-zero
+            psd_sum = psd.sum(axis=0)
+
+        features = np.empty((self.n_channels, N_CHANNEL_FEATURES))
+        features[:, 0] = self._shift + mean_offset
+        features[:, 1] = np.sqrt(var)
+        features[:, 2] = var
+        for b, band in enumerate(self._bands):
+            features[:, 3 + b] = psd[band].sum(axis=0)
+        p = psd / psd_sum
+        with np.errstate(divide='ignore', invalid='ignore'):
+            features[:, -1] = -np.sum(np.where(p > 0, p * np.log(p), 0.0), axis=0)
+
+        # Replace NaN values with 0
+        return np.nan_to_num(features.ravel())
@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import pandas as pd
 from scipy.signal import welch
@@ -5,27 +6,33 @@ from scipy.stats import entropy
 from sklearn.preprocessing import StandardScaler
 from sklearn.svm import SVC
 import joblib
-from ml_helpers import extract_features
+from ml_helpers import extract_features_batch, sliding_windows
+from fast_svm import FusedSVM
+from eeg_store import labels_at, load_store
 
 # Constants
 FS = 256  # Sampling frequency
 WINDOW_SIZE = FS  # 1 second of EEG data (256 samples)
+STEP = WINDOW_SIZE  # Slide 256 samples per step (smaller values overlap windows)
+STORE_PATH = "data/eeg_data"  # Written by collect_data.py
+CSV_PATH = "data/eeg_data.csv"  # Older recordings
 
 # Load EEG dataset
-df = pd.read_csv("data/eeg_data.csv")
+if os.path.isdir(STORE_PATH):
+    columns, _ = load_store(STORE_PATH)  # Memory-mapped; nothing is read until it is used
+    eeg = columns['eeg'][:, :5]  # (n, 5) -> EEG Data
+    label_rows = lambda rows: labels_at(columns, rows)  # Labels are stored as events
+else:
+    df = pd.read_csv(CSV_PATH)
+    eeg = df.iloc[:, :5].to_numpy()  # (n, 5) -> EEG Data
+    labels = df.iloc[:, 5].to_numpy()
+    label_rows = lambda rows: labels[rows]
 
 # Convert raw data into 256-sample windows
-X, y = [], []
+windows = sliding_windows(eeg, WINDOW_SIZE, STEP)  # (n_windows, 256, 5) view, no copies
 
-for i in range(0, len(df) - WINDOW_SIZE, WINDOW_SIZE):  # Slide 256 samples per step
-    eeg_window = df.iloc[i:i+WINDOW_SIZE, :5].values  # (256, 5) -> EEG Data
-    label = df.iloc[i+WINDOW_SIZE-1, 5]  # Use the last sample's label
-
-    X.append(extract_features(eeg_window, FS))
-    y.append(label)
-
-X = np.array(X)
-y = np.array(y)
+X = extract_features_batch(windows, FS)
+y = label_rows(np.arange(len(windows)) * STEP + WINDOW_SIZE - 1)  # Use the last sample's label
 
 # Scale Features
 scaler = StandardScaler()
@@ -38,5 +45,6 @@ clf.fit(X_scaled, y)
 # Save Model and Scaler
 joblib.dump(scaler, 'model/scaler.pkl')
 joblib.dump(clf, 'model/svm_model.pkl')
+FusedSVM.from_sklearn(scaler, clf).save('model/svm_model.npz')  # Loaded by main.py without sklearn
 
 print("Training complete. Model saved.")
@@ -1,106 +1,100 @@
-import numpy as np
-import joblib
-from pylsl import StreamInlet
+import os
+import time
 from machine_learning.eeg_helpers import resolve_stream
-from machine_learning.ml_helpers import extract_features
-from gyro.gyroscope import right_left_command
+from machine_learning.chunked_inlet import ChunkedInlet
+from machine_learning.streaming_features import StreamingFeatures
+from machine_learning.debounce import Debouncer
+from machine_learning.fast_svm import FusedSVM
+from pipeline import Pipeline
+from instrumentation import Reporter
+from gyro.orientation import OrientationEngine
 # from ui import telloFlip_l, telloFlip_r
 
 from tello import Tello
 # from ui import TelloUI
 
 # Create an instance of the Tello class
-tello = Tello(local_ip='0.0.0.0', local_port=8999)
-
-# Load trained model & scaler
-clf = joblib.load("model/svm_model.pkl")
-scaler = joblib.load("model/scaler.pkl")
+tello = Tello(local_ip='0.0.0.0', local_port=8999, listen_state=True)  # Getters read the 8890 state stream
+
+# Load trained model & scaler (the .npz needs neither sklearn nor joblib)
+MODEL_PATH = "model/svm_model.npz"
+if os.path.exists(MODEL_PATH):
+    model = FusedSVM.load(MODEL_PATH)
+else:
+    import joblib  # Slow: unpickling pulls in sklearn
+    clf = joblib.load("model/svm_model.pkl")
+    scaler = joblib.load("model/scaler.pkl")
+    model = FusedSVM.from_sklearn(scaler, clf)  # Scaler folded into the SVM, built once
+    model.save(MODEL_PATH)
 
 # Constants
 FS = 256
 WINDOW_SIZE = FS  # 1 second of EEG data
+N_CHANNELS = 5  # EEG channels used by the classifier
+HOP_SIZE = 16  # New samples between predictions
+DEBOUNCE_SECONDS = 200 / FS  # How long a class must be held before the drone flips
+REPORT_INTERVAL = 5.0  # Seconds between status reports; set MG_METRICS=0 to skip the timings
+RC_RATE = 30  # rc commands per second; 0 turns head yaw into discrete cw/ccw rotations
+IMU_FILTER = 'complementary'  # Or 'madgwick' / 'mahony'
 
 # Resolve EEG stream
 print("Looking for an EEG stream...")
 streams = resolve_stream('type', 'EEG')
-inlet = StreamInlet(streams[0])
+inlet = ChunkedInlet(streams[0])
 
 print("EEG stream connected.")
 
-buffer = []  # Stores 256 samples
-count_0 = 0
-count_1 = 0
+features = StreamingFeatures(FS, WINDOW_SIZE, N_CHANNELS, hop_size=HOP_SIZE)  # Sliding 256-sample window
+debouncer = Debouncer(DEBOUNCE_SECONDS, FS, HOP_SIZE)
     
 
 # Resolve gyroscope and accelerometer streams
 gyro_stream = resolve_stream('type', 'Gyroscope')
 accel_stream = resolve_stream('type', 'Accelerometer')
 
-gyro_inlet = StreamInlet(gyro_stream[0])
-accel_inlet = StreamInlet(accel_stream[0])
+gyro_inlet = ChunkedInlet(gyro_stream[0])
+accel_inlet = ChunkedInlet(accel_stream[0])
 
-# Initialize angles
-angle_x, angle_y, angle_z = 0.0, 0.0, 0.0  # Roll, Pitch, Yaw
+# Head orientation, integrated over the real IMU timestamps
+engine = OrientationEngine(IMU_FILTER)
 
 # Get initial accelerometer readings for a baseline
 accel_sample, _ = accel_inlet.pull_sample()
-ax, ay, az = accel_sample
+engine.reset(accel_sample)
 
-# Convert accelerometer data to initial angles
-angle_x = np.arctan2(ay, az) * (180 / np.pi)
-angle_y = np.arctan2(ax, np.sqrt(ay**2 + az**2)) * (180 / np.pi)
+print("Starting angles: X (Roll):", engine.roll, "Y (Pitch):", engine.pitch, "Z (Yaw):", engine.yaw)
 
-print("Starting angles: X (Roll):", angle_x, "Y (Pitch):", angle_y, "Z (Yaw):", angle_z)
+tello.takeoff()
+rc = tello.start_rc(RC_RATE) if RC_RATE else None  # Head yaw steers the drone continuously
 
-previous_angle_x = angle_x  # Store initial angle for comparison
-previous_angle_z = angle_z  # Store initial yaw angle for movement detection
+# IF the model is sure about the prediction flip the drone
+ACTIONS = {
+    0: ('flip', ('l',)),  # Flip left
+    1: ('flip', ('r',)),  # Flip right
+}
 
-tello.takeoff()
+# Every stream, the classifier, the IMU and the drone commands run on their own threads
+pipeline = Pipeline(inlet, gyro_inlet, accel_inlet, features, model, debouncer, tello, ACTIONS,
+                    engine, rc=rc)
+pipeline.start()
+
+# Per-stage timings and counters every REPORT_INTERVAL, instead of a print per prediction
+reporter = Reporter(interval=REPORT_INTERVAL,
+                    status=lambda: f"Predicted Class: {pipeline.classifier.last_prediction}")
+reporter.start()
 
 try:
     while True:
-        sample, timestamp = inlet.pull_sample()
-        
-        right_left_command(gyro_inlet, accel_inlet, angle_x, angle_y, angle_z, previous_angle_x, previous_angle_z)
-
-        if sample:
-            buffer.append(sample)  # Collect EEG sample
-
-            if len(buffer) >= WINDOW_SIZE:
-                eeg_window = np.array(buffer[-WINDOW_SIZE:])  # Take last 256 samples
-                feature_vector = extract_features(eeg_window, FS)
-                features_scaled = scaler.transform([feature_vector])
-
-                prediction = clf.predict(features_scaled)
-                print(f"\rPredicted Class: {prediction[0]}", end="")
-
-                # IF the model is sure about the prediction flip the drone
-                if prediction[0] == 0:
-                    count_0 += 1
-                    count_1 = 0  # Reset count for the other class
-                elif prediction[0] == 1:
-                    count_1 += 1
-                    count_0 = 0  # Reset count for the other class
-                else:
-                    count_0 = 0
-                    count_1 = 0
-
-                if count_0 == 200:
-                    print("\nTriggering flip left...")
-                    tello.flip('l')
-                    count_0 = 0  # Reset count after triggering
-
-                if count_1 == 200:
-                    print("\nTriggering flip right...")
-                    tello.flip('r')
-                    count_1 = 0  # Reset count after triggering
-
-                buffer.pop(0)  # Remove oldest sample (sliding window)
-
-        
+        time.sleep(1)
+
 except KeyboardInterrupt:
     print("Closing EEG stream...")
-    tello.land()
+    reporter.stop()
+    if rc is not None:
+        rc.stop()
+    # Jumps ahead of anything still queued and drops the pending motion
+    pipeline.scheduler.land().result()
+    pipeline.stop()
 
 
 
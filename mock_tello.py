@@ -0,0 +1,106 @@
+import socket
+import threading
+import time
+
+from tello import TelloState
+
+# Replies to the read commands; everything else is answered 'ok'
+QUERY_REPLIES = {
+    'battery?': '87',
+    'height?': '0dm',
+    'speed?': '10.0',
+    'time?': '0s',
+}
+
+
+class MockTello(object):
+    """
+    A stand-in for the drone on a local UDP port, for running the pipeline
+    and its benchmarks without hardware.
+
+    Every command it receives is recorded with its arrival time. Commands
+    are answered in order like the real Tello, after an optional delay; rc
+    commands get no reply, as on the real drone. With `state_port` set it
+    also pushes state packets to the client the way the Tello does on 8890.
+    """
+    def __init__(self, host='127.0.0.1', port=0, reply_delay=0.0, drop=(), state_port=None,
+                 state_rate_hz=10):
+        """
+        :param host: Address to listen on.
+        :param port: Port to listen on; 0 lets the OS pick one (see `address`).
+        :param reply_delay: Seconds to wait before answering each command.
+        :param drop: Commands (or command prefixes) never answered, to exercise timeouts.
+        :param state_port: Client port to push state packets to; None sends none.
+        :param state_rate_hz: State packets per second.
+        """
+        self.reply_delay = reply_delay
+        self.drop = tuple(drop)
+        self.state_port = state_port
+        self.state_rate_hz = state_rate_hz
+        self.commands = []  # (time.perf_counter() on arrival, command)
+        self.state = {name: 0 for name in TelloState.FIELDS}
+        self.state['bat'] = 87
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.address = self.socket.getsockname()
+        self._client = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._threads = [threading.Thread(target=self._command_thread, daemon=True)]
+        if state_port is not None:
+            self._threads.append(threading.Thread(target=self._state_thread, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _reply(self, command):
+        if command.startswith('rc ') or (self.drop and command.startswith(self.drop)):
+            return None
+        return QUERY_REPLIES.get(command, 'ok')
+
+    def _command_thread(self):
+        while not self._closed:
+            try:
+                packet, client = self.socket.recvfrom(1024)
+            except OSError:
+                return
+            command = packet.decode('utf-8', errors='replace').strip()
+            with self._lock:
+                self.commands.append((time.perf_counter(), command))
+                self._client = client
+            reply = self._reply(command)
+            if reply is None:
+                continue
+            if self.reply_delay:
+                time.sleep(self.reply_delay)
+            try:
+                self.socket.sendto(reply.encode('utf-8'), client)
+            except OSError:
+                return
+
+    def _state_thread(self):
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        while not self._closed:
+            time.sleep(1.0 / self.state_rate_hz)
+            with self._lock:
+                client = self._client
+                packet = ''.join(f'{name}:{value};' for name, value in self.state.items())
+            if client is not None:
+                sender.sendto(packet.encode('ascii'), (client[0], self.state_port))
+        sender.close()
+
+    def received(self, prefix=''):
+        """Commands received so far, optionally only those starting with `prefix`."""
+        with self._lock:
+            return [command for _, command in self.commands if command.startswith(prefix)]
+
+    def close(self):
+        self._closed = True
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,433 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from gyro.gyroscope import process_imu, rc_yaw_command
+from machine_learning.stream_sync import StreamSynchronizer
+from instrumentation import metrics as shared_metrics
+
+# Lower runs first. Anything not listed (queries, settings) runs last.
+PRIORITIES = {
+    'emergency': 0,
+    'land': 1,
+    'takeoff': 2,
+    'flip': 3,
+}
+MOTION_PRIORITY = 4
+DEFAULT_PRIORITY = 5
+
+ROTATIONS = {'rotate_cw': 1, 'rotate_ccw': -1}
+MOVES = {'move', 'move_forward', 'move_backward', 'move_left', 'move_right', 'move_up', 'move_down'}
+# Commands after which nothing still queued for motion makes sense any more
+FLUSHING = {'emergency', 'land'}
+IMU_MAX_LAG = 0.1  # Seconds the gyroscope waits for the accelerometer to catch up
+
+
+def put_latest(q, item):
+    """
+    Puts `item` on a bounded queue, dropping the oldest entry when it is full.
+    Returns the number of entries dropped.
+    """
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class StreamProducer(threading.Thread):
+    """
+    Drains one ChunkedInlet onto a bounded queue of (samples, timestamps, received_at) chunks.
+
+    Each stream gets its own producer, so a slow or stalled stream never holds
+    up the others. When a consumer falls behind, the oldest chunks are dropped.
+    """
+    def __init__(self, inlet, maxsize=64, pull_timeout=0.02, metrics=shared_metrics, sync=None, name=None):
+        """
+        :param inlet: ChunkedInlet to read from.
+        :param maxsize: Chunks buffered before the oldest are dropped.
+        :param pull_timeout: Longest wait inside a single pull (seconds).
+        :param metrics: Metrics the pull timings and counts go to.
+        :param sync: StreamSynchronizer whose clock offset for stream `name` this
+                     thread keeps fresh, as it is the only one calling into the inlet.
+        :param name: The stream's name in `sync`.
+        """
+        super().__init__(daemon=True, name=f'producer-{inlet.type}')
+        self.inlet = inlet
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.pull_timeout = pull_timeout
+        self.metrics = metrics
+        self.sync = sync
+        self.sync_name = name
+        self.dropped = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        stream = self.inlet.type.lower()
+        while not self._stop_event.is_set():
+            if self.sync is not None:
+                self.sync.refresh_if_due(self.sync_name)
+            start = time.perf_counter()
+            samples, timestamps = self.inlet.pull(timeout=self.pull_timeout)
+            if len(samples):
+                # Copy out of the inlet's buffer before the next pull reuses it
+                chunk = (samples.copy(), timestamps.copy(), time.perf_counter())
+                dropped = put_latest(self.queue, chunk)
+                self.dropped += dropped
+                # Includes any wait for the first sample of the chunk
+                self.metrics.record(f'pull.{stream}', chunk[2] - start)
+                self.metrics.count(f'samples.{stream}', len(samples))
+                if dropped:
+                    self.metrics.count(f'dropped.{stream}', dropped)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _chain(source, target):
+    """Resolves `target` with whatever `source` ends up with."""
+    def copy(done):
+        if done.cancelled():
+            target.cancel()
+        elif done.exception() is not None:
+            target.set_exception(done.exception())
+        else:
+            target.set_result(done.result())
+    source.add_done_callback(copy)
+
+
+class _Entry(object):
+    __slots__ = ('method', 'args', 'future', 'submitted_at', 'cancelled')
+
+    def __init__(self, method, args, future):
+        self.method = method
+        self.args = args
+        self.future = future
+        self.submitted_at = time.perf_counter()
+        self.cancelled = False
+
+
+class CommandScheduler(threading.Thread):
+    """
+    The single path from the rest of the program to one drone.
+
+    Commands wait in a priority queue, so `land` and `emergency` jump ahead of
+    everything else and throw away every other queued command, takeoff
+    included. Queued rotations are merged into one net rotation, and a new
+    move replaces a queued one that has not been sent yet, so a shaky IMU
+    cannot build up a backlog of stale motion.
+
+    Any Tello method can be called on the scheduler itself, e.g.
+    `scheduler.flip('l')`; the call is queued and a Future for its result is
+    returned immediately. Futures of commands that were merged away resolve
+    with the merged command's response; superseded ones are cancelled.
+    """
+    def __init__(self, drone, metrics=shared_metrics):
+        """
+        :param drone: Tello instance the commands are sent to.
+        :param metrics: Metrics the command timings and counts go to.
+        """
+        super().__init__(daemon=True, name='command-scheduler')
+        self.drone = drone
+        self.metrics = metrics
+        self.coalesced = 0  # Commands merged into a queued one
+        self.dropped = 0  # Commands cancelled as stale
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def submit(self, method, *args):
+        """
+        Queues `drone.<method>(*args)` and returns a Future for its response.
+        """
+        future = Future()
+        with self._condition:
+            if method in ROTATIONS and self._coalesce_rotation(method, args, future):
+                return future
+            if method in MOVES:
+                self._cancel_queued(lambda entry: entry.method in MOVES)
+            if method in FLUSHING:
+                self._cancel_queued(lambda entry: entry.method not in FLUSHING)
+
+            entry = _Entry(method, args, future)
+            heapq.heappush(self._heap, (self._priority(method), next(self._seq), entry))
+            self._condition.notify()
+        return future
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return lambda *args: self.submit(method, *args)
+
+    @staticmethod
+    def _priority(method):
+        if method in ROTATIONS or method in MOVES:
+            return MOTION_PRIORITY
+        return PRIORITIES.get(method, DEFAULT_PRIORITY)
+
+    def _queued(self):
+        return [entry for _, _, entry in self._heap if not entry.cancelled]
+
+    def _coalesce_rotation(self, method, args, future):
+        """Folds a rotation into one already queued. Returns True if it was merged."""
+        queued = [entry for entry in self._queued() if entry.method in ROTATIONS]
+        if not queued:
+            return False
+        entry = queued[0]
+        net = ROTATIONS[entry.method] * int(entry.args[0]) + ROTATIONS[method] * int(args[0])
+        self.coalesced += 1
+        self.metrics.count('commands.coalesced')
+        if net == 0:
+            # The two rotations cancel out; neither needs to be sent
+            entry.cancelled = True
+            entry.future.set_result('coalesced')
+            future.set_result('coalesced')
+            return True
+        entry.method = 'rotate_cw' if net > 0 else 'rotate_ccw'
+        entry.args = (min(abs(net), 3600),)
+        _chain(entry.future, future)
+        return True
+
+    def _cancel_queued(self, predicate):
+        for entry in self._queued():
+            if predicate(entry):
+                entry.cancelled = True
+                entry.future.cancel()
+                self.dropped += 1
+                self.metrics.count('commands.dropped')
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._heap and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                _, _, entry = heapq.heappop(self._heap)
+                if entry.cancelled or not entry.future.set_running_or_notify_cancel():
+                    continue
+
+            started_at = time.perf_counter()
+            self.metrics.record('command.queue', started_at - entry.submitted_at)
+            try:
+                entry.future.set_result(getattr(self.drone, entry.method)(*entry.args))
+            except Exception as exc:
+                entry.future.set_exception(exc)
+                self.metrics.count('command.errors')
+            self.metrics.record('command', time.perf_counter() - started_at)
+
+    def stop(self):
+        """Stops the worker once the command in flight (if any) finishes; queued commands are dropped."""
+        with self._condition:
+            self._stopped = True
+            for _, _, entry in self._heap:
+                entry.future.cancel()
+            self._heap = []
+            self._condition.notify()
+
+
+class ClassifierConsumer(threading.Thread):
+    """
+    Turns EEG chunks into predictions and debounced flip commands.
+    """
+    def __init__(self, eeg_queue, features, model, debouncer, scheduler, actions, metrics=shared_metrics):
+        """
+        :param eeg_queue: Queue fed by the EEG StreamProducer.
+        :param features: StreamingFeatures engine.
+        :param model: FusedSVM classifier.
+        :param debouncer: Debouncer deciding when a prediction becomes a command.
+        :param scheduler: CommandScheduler for drone commands.
+        :param actions: Maps a class label to a (method, args) drone command.
+        :param metrics: Metrics the stage timings go to.
+        """
+        super().__init__(daemon=True, name='classifier')
+        self.eeg_queue = eeg_queue
+        self.features = features
+        self.model = model
+        self.debouncer = debouncer
+        self.scheduler = scheduler
+        self.actions = actions
+        self.last_prediction = None
+        self.metrics = metrics
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                samples, _, received_at = self.eeg_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            metrics = self.metrics
+            start = time.perf_counter()
+            metrics.record('queue.eeg', start - received_at)
+
+            feature_vectors = self.features.push_chunk(samples)
+            metrics.record('features', time.perf_counter() - start)
+
+            for feature_vector in feature_vectors:
+                predict_start = time.perf_counter()
+                # The scaler is folded into the model, so this is scale + predict
+                self.last_prediction = self.model.predict_one(feature_vector)
+                predict_done = time.perf_counter()
+                metrics.record('predict', predict_done - predict_start)
+
+                decision = self.debouncer.update(self.last_prediction)
+                metrics.record('debounce', time.perf_counter() - predict_done)
+                metrics.count('predictions')
+                if decision in self.actions:
+                    method, args = self.actions[decision]
+                    self.scheduler.submit(method, *args)
+                    # From the EEG chunk arriving to the command being queued
+                    metrics.record('decision', time.perf_counter() - received_at)
+                    metrics.count('decisions')
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class ImuConsumer(threading.Thread):
+    """
+    Feeds gyroscope and accelerometer chunks to the head-turn detection.
+    """
+    def __init__(self, gyro_queue, accel_queue, scheduler, engine, rc=None, metrics=shared_metrics,
+                 sync=None):
+        """
+        :param gyro_queue: Queue fed by the gyroscope StreamProducer.
+        :param accel_queue: Queue fed by the accelerometer StreamProducer.
+        :param scheduler: CommandScheduler the rotations are sent through.
+        :param engine: OrientationEngine holding the head orientation between chunks.
+        :param rc: RcSender; when given, head yaw rate steers the drone continuously
+                   instead of triggering discrete rotations.
+        :param metrics: Metrics the stage timings go to.
+        :param sync: StreamSynchronizer over streams 'gyro' (the reference, one-sample
+                     windows) and 'accel'. When given, both are moved onto the local
+                     clock and gyroscope samples wait (up to its max_lag) for the
+                     accelerometer to cover them, so each chunk sees matching accel.
+                     The StreamProducers keep its clock offsets fresh.
+        """
+        super().__init__(daemon=True, name='imu')
+        self.gyro_queue = gyro_queue
+        self.accel_queue = accel_queue
+        self.scheduler = scheduler
+        self.engine = engine
+        self.rc = rc
+        self.metrics = metrics
+        self.sync = sync
+        self._stop_event = threading.Event()
+
+    def _synced(self, gyro_samples, gyro_timestamps, accel_chunks):
+        """Runs the chunks through the synchronizer; returns the gyro/accel rows now aligned."""
+        for samples, timestamps, _ in accel_chunks:
+            self.sync.add('accel', samples, timestamps)
+        self.sync.add('gyro', gyro_samples, gyro_timestamps)
+        windows = list(self.sync.windows())
+        if not windows:
+            return np.empty((0, 3)), np.empty(0), np.empty((0, 3)), np.empty(0)
+        timestamps = np.concatenate([window.timestamps for window in windows])
+        gyro = np.concatenate([window.streams['gyro'] for window in windows])
+        accel = np.concatenate([window.streams['accel'] for window in windows])
+        known = ~np.isnan(accel).any(axis=1)  # NaN until the accelerometer's first sample
+        return gyro, timestamps, accel[known], timestamps[known]
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                gyro_samples, gyro_timestamps, received_at = self.gyro_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            accel_chunks = []
+            while True:
+                try:
+                    accel_chunks.append(self.accel_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            start = time.perf_counter()
+            self.metrics.record('queue.imu', start - received_at)
+            if self.sync is not None:
+                gyro_samples, gyro_timestamps, accel_samples, accel_timestamps = self._synced(
+                    gyro_samples, gyro_timestamps, accel_chunks)
+            elif accel_chunks:
+                accel_samples = np.concatenate([chunk[0] for chunk in accel_chunks])
+                accel_timestamps = np.concatenate([chunk[1] for chunk in accel_chunks])
+            else:
+                accel_samples, accel_timestamps = np.empty((0, 3)), np.empty(0)
+
+            if self.rc is not None:
+                rc_yaw_command(gyro_samples, self.rc)
+            else:
+                process_imu(gyro_samples, gyro_timestamps, accel_samples, accel_timestamps,
+                            self.engine, self.scheduler)
+            self.metrics.record('imu', time.perf_counter() - start)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class Pipeline(object):
+    """
+    EEG, gyroscope and accelerometer producers, classifier and IMU consumers,
+    and the drone's command scheduler, each on its own thread.
+    """
+    def __init__(self, eeg_inlet, gyro_inlet, accel_inlet, features, model, debouncer, drone,
+                 actions, engine, maxsize=64, rc=None, metrics=shared_metrics, imu_max_lag=IMU_MAX_LAG):
+        """
+        :param eeg_inlet: ChunkedInlet of the EEG stream.
+        :param gyro_inlet: ChunkedInlet of the gyroscope stream.
+        :param accel_inlet: ChunkedInlet of the accelerometer stream.
+        :param features: StreamingFeatures engine.
+        :param model: FusedSVM classifier.
+        :param debouncer: Debouncer for the classifier output.
+        :param drone: Tello the commands are sent to.
+        :param actions: Maps a class label to a (method, args) drone command.
+        :param engine: OrientationEngine for the head orientation, see ImuConsumer.
+        :param maxsize: Chunks buffered per stream before the oldest are dropped.
+        :param rc: Optional RcSender for continuous yaw control, see ImuConsumer.
+        :param metrics: Metrics every stage reports to.
+        :param imu_max_lag: Longest wait (seconds) for the accelerometer to catch up
+                            with the gyroscope, see StreamSynchronizer; None feeds
+                            the IMU chunks through unsynchronized, as does rc mode.
+        """
+        self.metrics = metrics
+        sync = None
+        if imu_max_lag is not None and rc is None:  # rc steers from the gyroscope alone
+            sync = StreamSynchronizer({'gyro': gyro_inlet, 'accel': accel_inlet}, 'gyro',
+                                      window_size=1, max_lag=imu_max_lag)
+        self.eeg = StreamProducer(eeg_inlet, maxsize, metrics=metrics)
+        self.gyro = StreamProducer(gyro_inlet, maxsize, metrics=metrics, sync=sync, name='gyro')
+        self.accel = StreamProducer(accel_inlet, maxsize, metrics=metrics, sync=sync, name='accel')
+        self.scheduler = CommandScheduler(drone, metrics)
+        self.classifier = ClassifierConsumer(self.eeg.queue, features, model, debouncer,
+                                             self.scheduler, actions, metrics)
+        self.imu = ImuConsumer(self.gyro.queue, self.accel.queue, self.scheduler, engine, rc, metrics, sync)
+        self._threads = [self.scheduler, self.classifier, self.imu, self.eeg, self.gyro, self.accel]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stops every stage and waits up to `timeout` seconds for each thread."""
+        for thread in reversed(self._threads):
+            thread.stop()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def latency(self):
+        """
+        Per-stage timings and counters, see Metrics.snapshot.
+        """
+        return self.metrics.snapshot()
@@ -1,6 +1,179 @@
+import asyncio
+import itertools
 import socket
 import threading
 import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from instrumentation import metrics
+
+
+class _PendingCommand(object):
+    """
+    A command waiting for its reply. The Tello answers commands in the order it
+    receives them, so replies are matched to the oldest pending command.
+    """
+    __slots__ = ('seq', 'command', 'future', 'expired_at')
+
+    def __init__(self, seq, command):
+        self.seq = seq
+        self.command = command
+        self.future = Future()
+        self.expired_at = None  # Set when the sender gives up waiting
+
+
+class TelloState(object):
+    """
+    One packet of the Tello's push state stream (UDP 8890), e.g.
+    'pitch:0;roll:0;yaw:0;vgx:0;vgy:0;vgz:0;templ:60;temph:62;tof:10;h:0;bat:87;baro:123.45;time:0;agx:0.00;agy:0.00;agz:-1000.00;'
+    """
+    # Field name -> type, in the order the Tello sends them
+    FIELDS = {
+        'pitch': int, 'roll': int, 'yaw': int,   # Attitude (degrees)
+        'vgx': int, 'vgy': int, 'vgz': int,      # Velocity (dm/s)
+        'templ': int, 'temph': int,              # Temperature range (C)
+        'tof': int,                              # Time-of-flight distance (cm)
+        'h': int,                                # Height (cm)
+        'bat': int,                              # Battery (%)
+        'baro': float,                           # Barometer altitude (m)
+        'time': int,                             # Motor on time (s)
+        'agx': float, 'agy': float, 'agz': float,  # Acceleration (0.001 g)
+    }
+    __slots__ = tuple(FIELDS) + ('received_at',)
+
+    def __init__(self, received_at=None, **values):
+        for name in self.FIELDS:
+            setattr(self, name, values.get(name))
+        self.received_at = time.monotonic() if received_at is None else received_at
+
+    @classmethod
+    def parse(cls, packet, received_at=None):
+        """
+        Parses a raw state packet; unknown fields (e.g. mission pad data) are ignored.
+
+        :param packet: Packet bytes or string.
+        :return: TelloState, or None if the packet holds no known field.
+        """
+        if isinstance(packet, bytes):
+            packet = packet.decode('ascii', errors='replace')
+        values = {}
+        for item in packet.strip().split(';'):
+            name, _, value = item.partition(':')
+            field_type = cls.FIELDS.get(name)
+            if field_type is None:
+                continue
+            try:
+                values[name] = field_type(float(value)) if field_type is int else field_type(value)
+            except ValueError:
+                pass
+        return cls(received_at, **values) if values else None
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)}' for name in self.FIELDS)
+        return f'TelloState({fields})'
+
+
+class TelloStateListener(object):
+    """
+    Background listener for the Tello's state stream.
+    Keeps the latest TelloState plus a bounded history of recent ones.
+    """
+    def __init__(self, local_ip='0.0.0.0', state_port=8890, history=256):
+        """
+        :param local_ip: Local IP address to bind.
+        :param state_port: Port the Tello pushes state packets to.
+        :param history: Number of recent states kept in self.history.
+        """
+        self.latest = None
+        self.history = deque(maxlen=history)
+        self.packets = 0
+        self._closed = False
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((local_ip, state_port))
+
+        self.thread = threading.Thread(target=self._receive_thread)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _receive_thread(self):
+        while not self._closed:
+            try:
+                packet, _ = self.socket.recvfrom(1024)
+            except socket.error as exc:
+                if not self._closed:
+                    print(f'Caught exception socket.error : {exc}')
+                continue
+            state = TelloState.parse(packet)
+            if state is not None:
+                self.history.append(state)
+                self.latest = state
+                self.packets += 1
+
+    def fresh(self, max_age):
+        """
+        Returns the latest state if it is at most `max_age` seconds old, otherwise None.
+        """
+        state = self.latest
+        if state is None or time.monotonic() - state.received_at > max_age:
+            return None
+        return state
+
+    def close(self):
+        self._closed = True
+        self.socket.close()
+
+
+class RcSender(object):
+    """
+    Sends the latest rc setpoint to the Tello at a fixed rate from a background thread.
+
+    Setting a new setpoint never blocks; whatever was set last goes out on the
+    next tick. rc commands get no reply, so nothing waits on the socket.
+    """
+    def __init__(self, tello, rate_hz=30):
+        """
+        :param tello: Tello to send through.
+        :param rate_hz: Send rate; the Tello expects roughly 20-50 Hz.
+        """
+        self.tello = tello
+        self.period = 1.0 / rate_hz
+        self.setpoint = (0, 0, 0, 0)
+        self.sent = 0
+        self._stop_event = threading.Event()
+
+        self.thread = threading.Thread(target=self._send_thread)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def set(self, left_right=0, forward_back=0, up_down=0, yaw=0):
+        """
+        Replaces the setpoint; each value is clamped to -100..100.
+        """
+        self.setpoint = tuple(max(-100, min(100, int(v))) for v in (left_right, forward_back, up_down, yaw))
+
+    def _send_thread(self):
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            self.tello.rc(*self.setpoint)
+            self.sent += 1
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()  # Fell behind; don't send a burst to catch up
+            else:
+                self._stop_event.wait(delay)
+
+    def stop(self):
+        """
+        Stops sending and leaves the drone hovering (all sticks centred).
+        """
+        self._stop_event.set()
+        self.thread.join(1.0)
+        self.setpoint = (0, 0, 0, 0)
+        self.tello.rc(0, 0, 0, 0)
+
 
 class Tello(object):
     """
@@ -10,7 +183,11 @@ class Tello(object):
     def __init__(self, local_ip, local_port, imperial=False, 
                  command_timeout=0.3, 
                  tello_ip='192.168.10.1',
-                 tello_port=8889):
+                 tello_port=8889,
+                 late_reply_grace=None,
+                 listen_state=False,
+                 state_port=8890,
+                 state_max_age=1.0):
         """
         Binds to the local IP/port and puts the Tello into command mode.
 
@@ -21,12 +198,31 @@ class Tello(object):
         :param command_timeout: Number of seconds to wait for a response to a command.
         :param tello_ip: Tello IP.
         :param tello_port: Tello port.
+        :param late_reply_grace: Seconds after a timeout during which a reply is still
+                                 treated as the late reply of the timed-out command
+                                 (and dropped) rather than the reply to the next one.
+                                 Defaults to 10 * command_timeout.
+        :param listen_state: If True, listen for the Tello's state stream and answer
+                             get_height/get_battery/get_flight_time from it, and
+                             provide get_ground_speed.
+        :param state_port: Local port the state stream arrives on.
+        :param state_max_age: Seconds a state packet is trusted before the getters
+                              fall back to querying the Tello.
         """
-        self.abort_flag = False
         self.command_timeout = command_timeout
+        self.late_reply_grace = late_reply_grace if late_reply_grace is not None else 10 * command_timeout
         self.imperial = imperial
         self.response = None
         self.last_height = 0
+        self.late_replies = 0  # Replies dropped because their command had timed out
+
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._seq = itertools.count()
+        self._closed = False
+
+        self.state_max_age = state_max_age
+        self.state = TelloStateListener(local_ip, state_port) if listen_state else None
 
         # Create a UDP socket
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -42,59 +238,106 @@ class Tello(object):
         self.receive_thread.daemon = True
         self.receive_thread.start()
 
-        # Send initial "command" to enter SDK mode
-        self.socket.sendto(b'command', self.tello_address)
+        # Send initial "command" to enter SDK mode and wait for its "ok" here; if it is
+        # lost (e.g. the drone is not up yet) its slot must not take the next reply
+        future = self.send_command_async('command')
         print('sent: command')
+        try:
+            future.result(timeout=command_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._pending_lock:
+                self._pending.clear()
 
     def __del__(self):
         """
         Closes the local socket.
         """
+        self.close()
+
+    def close(self):
+        """
+        Closes the local socket and stops the receive thread.
+        """
+        self._closed = True
         self.socket.close()
+        if self.state is not None:
+            self.state.close()
 
     def _receive_thread(self):
         """
         Listens to responses from the Tello.
-        Runs as a thread, sets self.response to whatever the Tello last returned.
+        Runs as a thread and hands each reply to the future of the command it answers.
         """
-        while True:
+        while not self._closed:
             try:
-                self.response, _ = self.socket.recvfrom(3000)
+                response, _ = self.socket.recvfrom(3000)
             except socket.error as exc:
-                print(f'Caught exception socket.error : {exc}')
+                if not self._closed:
+                    print(f'Caught exception socket.error : {exc}')
+                continue
+            self.response = response
+            self._resolve(response)
 
-    def send_command(self, command):
+    def _resolve(self, response):
         """
-        Sends a command to the Tello and waits for a response.
+        Matches a reply to the oldest pending command.
         """
-        print(f'>> send cmd: {command}')
-        self.abort_flag = False
-        timer = threading.Timer(self.command_timeout, self.set_abort_flag)
+        with self._pending_lock:
+            now = time.monotonic()
+            # Commands that timed out long ago never got a reply; stop waiting for it
+            while (self._pending and self._pending[0].expired_at is not None
+                   and now - self._pending[0].expired_at > self.late_reply_grace):
+                self._pending.popleft()
+            if not self._pending:
+                return  # Unsolicited reply
+            pending = self._pending.popleft()
+
+        if pending.expired_at is not None or not pending.future.set_running_or_notify_cancel():
+            self.late_replies += 1  # Late reply to a command that already timed out
+            metrics.count('udp.late_replies')
+            return
+        pending.future.set_result(response.decode('utf-8', errors='replace'))
+
+    def _expire(self, pending):
+        """Marks a pending command as timed out, keeping its slot to absorb a late reply."""
+        with self._pending_lock:
+            if pending.expired_at is None:
+                pending.expired_at = time.monotonic()
+
+    def send_command_async(self, command):
+        """
+        Sends a command to the Tello without waiting.
 
-        # Send command
+        :param command: SDK command string.
+        :return: concurrent.futures.Future resolving to the decoded reply.
+                 Cancelling the future marks the command as timed out.
+        """
+        with self._pending_lock:
+            pending = _PendingCommand(next(self._seq), command)
+            self._pending.append(pending)
+        pending.future.add_done_callback(lambda f: f.cancelled() and self._expire(pending))
         self.socket.sendto(command.encode('utf-8'), self.tello_address)
+        return pending.future
 
-        # Start timer, wait for response
-        timer.start()
-        while self.response is None:
-            if self.abort_flag:
-                break
-        timer.cancel()
-        
-        # Interpret response
-        if self.response is None:
-            response = 'none_response'
-        else:
-            response = self.response.decode('utf-8')
-
-        self.response = None
-        return response
-    
-    def set_abort_flag(self):
+    def send_command(self, command):
         """
-        Sets self.abort_flag to True if the command times out.
+        Sends a command to the Tello and waits for a response.
+        Returns 'none_response' if no reply arrives within command_timeout.
         """
-        self.abort_flag = True
+        print(f'>> send cmd: {command}')
+        start = time.perf_counter()
+        future = self.send_command_async(command)
+        try:
+            response = future.result(timeout=self.command_timeout)
+        except FutureTimeoutError:
+            if not future.cancel():  # The reply raced in just after the timeout
+                response = future.result()
+            else:
+                metrics.count('udp.timeouts')
+                response = 'none_response'
+        metrics.record('udp', time.perf_counter() - start)
+        return response
 
     # ---------------------------
     # Basic Drone Control Methods
@@ -131,6 +374,21 @@ class Tello(object):
         """Flips in the given direction ('l', 'r', 'f', 'b')."""
         return self.send_command(f'flip {direction}')
 
+    def rc(self, left_right, forward_back, up_down, yaw):
+        """
+        Sends one rc stick command (-100..100 each). The Tello does not reply to
+        rc, so this returns immediately and never waits on the socket.
+        """
+        self.socket.sendto(f'rc {left_right} {forward_back} {up_down} {yaw}'.encode('utf-8'),
+                           self.tello_address)
+
+    def start_rc(self, rate_hz=30):
+        """
+        Starts continuous rc control and returns its RcSender; call .set(...) on it
+        to steer and .stop() to hover again.
+        """
+        return RcSender(self, rate_hz)
+
     # ---------------------------
     # Movement Methods
     # ---------------------------
@@ -184,10 +442,57 @@ class Tello(object):
 
     def get_height(self):
         """
-        Queries the Tello for its current height (in dm).
-        Converts the result to an integer or reuses the last known height on failure.
+        Returns the current height (in dm), from the state stream when it is fresh.
+        Otherwise queries the Tello and converts the result to an integer,
+        reusing the last known height on failure.
         """
-        height = self.send_command('height?')
+        state = self._fresh_state()
+        if state is not None and state.h is not None:
+            self.last_height = state.h // 10
+            return self.last_height
+        return self._parse_height(self.send_command('height?'))
+
+    def get_battery(self):
+        """Returns percent battery life remaining."""
+        state = self._fresh_state()
+        if state is not None and state.bat is not None:
+            return state.bat
+        return self._parse_int(self.send_command('battery?'))
+
+    def get_flight_time(self):
+        """Returns the number of seconds elapsed during flight."""
+        state = self._fresh_state()
+        if state is not None and state.time is not None:
+            return state.time
+        return self._parse_int(self.send_command('time?'))
+
+    def get_speed(self):
+        """Returns the configured speed (as set by set_speed) in KPH or MPH."""
+        return self._parse_speed(self.send_command('speed?'))
+
+    def get_ground_speed(self):
+        """
+        Returns the current ground speed in KPH or MPH from the state stream,
+        or None when it is not being listened to or has gone stale.
+        """
+        state = self._fresh_state()
+        if state is None or state.vgx is None:
+            return None
+        # dm/s -> cm/s, then the usual conversion
+        return self._parse_speed(10 * (state.vgx ** 2 + state.vgy ** 2 + state.vgz ** 2) ** 0.5)
+
+    def get_state(self):
+        """Returns the latest TelloState, or None when not listening or nothing arrived yet."""
+        return self.state.latest if self.state is not None else None
+
+    def _fresh_state(self):
+        """Latest state if the listener is running and the packet is recent enough."""
+        if self.state is None:
+            return None
+        return self.state.fresh(self.state_max_age)
+
+    def _parse_height(self, height):
+        """Height reply -> int, or the last known height on failure."""
         height_str = ''.join(filter(str.isdigit, str(height)))
         try:
             height_val = int(height_str)
@@ -196,27 +501,16 @@ class Tello(object):
             height_val = self.last_height
         return height_val
 
-    def get_battery(self):
-        """Returns percent battery life remaining."""
-        battery = self.send_command('battery?')
-        try:
-            battery = int(battery)
-        except:
-            pass
-        return battery
-
-    def get_flight_time(self):
-        """Returns the number of seconds elapsed during flight."""
-        flight_time = self.send_command('time?')
+    @staticmethod
+    def _parse_int(reply):
+        """Integer reply -> int, or the raw reply on failure."""
         try:
-            flight_time = int(flight_time)
+            return int(reply)
         except:
-            pass
-        return flight_time
+            return reply
 
-    def get_speed(self):
-        """Returns the current speed in KPH or MPH."""
-        speed = self.send_command('speed?')
+    def _parse_speed(self, speed):
+        """Speed reply in cm/s -> KPH or MPH, or the raw reply on failure."""
         try:
             speed_val = float(speed)
             if self.imperial:
@@ -228,3 +522,57 @@ class Tello(object):
             return speed_val
         except:
             return speed  # fallback (string)
+
+
+class AsyncTello(Tello):
+    """
+    asyncio flavour of Tello: every command method returns an awaitable.
+
+        drone = AsyncTello('0.0.0.0', 8999)
+        await drone.takeoff()
+        height = await drone.get_height()
+
+    Replies are still received by the background thread and delivered through
+    the same per-command futures, so no event-loop socket handling is needed.
+    """
+
+    async def send_command(self, command, timeout=None):
+        """
+        Sends a command and waits for its reply without blocking the event loop.
+
+        :param command: SDK command string.
+        :param timeout: Seconds to wait; defaults to command_timeout.
+        :return: The decoded reply, or 'none_response' on timeout.
+        """
+        print(f'>> send cmd: {command}')
+        future = asyncio.wrap_future(self.send_command_async(command))
+        try:
+            return await asyncio.wait_for(future, self.command_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            return 'none_response'  # wait_for cancelled the future, which marks it timed out
+
+    async def get_height(self):
+        """Returns the current height (in dm), from the state stream when it is fresh."""
+        state = self._fresh_state()
+        if state is not None and state.h is not None:
+            self.last_height = state.h // 10
+            return self.last_height
+        return self._parse_height(await self.send_command('height?'))
+
+    async def get_battery(self):
+        """Returns percent battery life remaining."""
+        state = self._fresh_state()
+        if state is not None and state.bat is not None:
+            return state.bat
+        return self._parse_int(await self.send_command('battery?'))
+
+    async def get_flight_time(self):
+        """Returns the number of seconds elapsed during flight."""
+        state = self._fresh_state()
+        if state is not None and state.time is not None:
+            return state.time
+        return self._parse_int(await self.send_command('time?'))
+
+    async def get_speed(self):
+        """Returns the configured speed (as set by set_speed) in KPH or MPH."""
+        return self._parse_speed(await self.send_command('speed?'))
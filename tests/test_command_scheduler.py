@@ -0,0 +1,59 @@
+import threading
+import unittest
+
+from pipeline import CommandScheduler
+
+
+class FakeDrone(object):
+    """Records commands; the first one blocks until released, so others queue behind it."""
+    def __init__(self):
+        self.commands = []
+        self.release = threading.Event()
+
+    def __getattr__(self, method):
+        def command(*args):
+            self.commands.append((method,) + args)
+            if len(self.commands) == 1:
+                self.release.wait(5)
+            return 'ok'
+        return command
+
+
+class CommandSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.drone = FakeDrone()
+        self.scheduler = CommandScheduler(self.drone)
+        self.scheduler.start()
+        self.busy = self.scheduler.flip('f')  # Holds the worker while the next commands queue
+
+    def tearDown(self):
+        self.drone.release.set()
+        self.scheduler.stop()
+
+    def wait_busy(self):
+        while not self.drone.commands:
+            threading.Event().wait(0.001)
+
+    def test_land_drops_queued_takeoff(self):
+        self.wait_busy()
+        takeoff = self.scheduler.takeoff()
+        land = self.scheduler.land()
+        self.drone.release.set()
+        self.assertEqual(land.result(5), 'ok')
+        self.assertTrue(takeoff.cancelled())
+        self.assertEqual([c[0] for c in self.drone.commands], ['flip', 'land'])
+
+    def test_emergency_keeps_queued_land(self):
+        self.wait_busy()
+        flip = self.scheduler.flip('l')
+        land = self.scheduler.land()
+        emergency = self.scheduler.emergency()
+        self.drone.release.set()
+        self.assertEqual(land.result(5), 'ok')
+        self.assertEqual(emergency.result(5), 'ok')
+        self.assertTrue(flip.cancelled())
+        self.assertEqual([c[0] for c in self.drone.commands], ['flip', 'emergency', 'land'])
+
+
+if __name__ == '__main__':
+    unittest.main()
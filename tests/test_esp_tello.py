@@ -0,0 +1,64 @@
+import os
+import threading
+import unittest
+
+try:
+    import tty
+    from ESP_32_Controller.lib.ESPTelloCLI.ESPSwarm.tello import Tello
+except ImportError:  # pyserial or ptys unavailable
+    Tello = None
+
+
+class FakeAdapter(object):
+    """A pty answering like the ESPTelloCLI sketch; Tello replies come without a newline."""
+    def __init__(self):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.name = os.ttyname(slave)
+        self.commands = []
+        self.connected = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        buffer = b''
+        while True:
+            try:
+                buffer += os.read(self.master, 1024)
+            except OSError:
+                return
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                self._answer(line.decode().strip())
+
+    def _answer(self, command):
+        self.commands.append(command)
+        if command == 'connect?':
+            os.write(self.master, b'ok\r\n' if self.connected else b'error\r\n')
+        elif command.startswith('connect'):
+            os.write(self.master, b'ok\r\n')
+            os.write(self.master, b'WiFi connected! IP address: 192.168.10.2\r\n')
+            self.connected = True
+        elif command == 'battery?':
+            os.write(self.master, b'87')
+        else:
+            os.write(self.master, b'ok')
+
+
+@unittest.skipIf(Tello is None, "needs pyserial and ptys")
+class TelloConnectTest(unittest.TestCase):
+    def test_connect_twice_reuses_the_port(self):
+        adapter = FakeAdapter()
+        tello = Tello(adapter.name, 'TELLO-TEST', timeouts={'connect': 2, 'connect?': 2})
+        try:
+            self.assertIn('connected', tello.connect())
+            transport = tello.transport
+            self.assertTrue(tello.connect())
+            self.assertIs(tello.transport, transport)
+            self.assertEqual(tello.get_battery(), '87')
+            self.assertEqual(adapter.commands, ['connect TELLO-TEST', 'connect?', 'battery?'])
+        finally:
+            tello.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
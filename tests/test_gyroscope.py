@@ -0,0 +1,42 @@
+import contextlib
+import io
+import unittest
+
+import gyro.gyroscope as gyroscope
+
+
+class FakeDrone(object):
+    def __init__(self):
+        self.commands = []
+
+    def rotate_cw(self, degrees):
+        self.commands.append(('rotate_cw', degrees))
+
+    def rotate_ccw(self, degrees):
+        self.commands.append(('rotate_ccw', degrees))
+
+
+class DetectTurnsTest(unittest.TestCase):
+    def setUp(self):
+        gyroscope.last_descision = 'none'
+        gyroscope.cumulative_angle = 0
+        self.drone = FakeDrone()
+
+    def detect(self, yaw_changes, dt=1 / 52):
+        rates = [change / dt for change in yaw_changes]
+        with contextlib.redirect_stdout(io.StringIO()):
+            gyroscope._detect_turns(yaw_changes, rates, self.drone)
+
+    def test_sub_degree_turn_is_not_sent(self):
+        self.detect([-0.6, 0.0])  # One sample just over TURN_RATE at 52 Hz
+        self.assertEqual(self.drone.commands, [])
+        self.assertAlmostEqual(gyroscope.cumulative_angle, -0.6)
+
+    def test_sub_degree_turns_accumulate(self):
+        self.detect([-0.6, 0.0, -0.6, 0.0])
+        self.assertEqual(self.drone.commands, [('rotate_cw', 1)])
+        self.assertEqual(gyroscope.cumulative_angle, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from instrumentation import Histogram
+
+
+class HistogramTest(unittest.TestCase):
+    def test_snapshot_until_mark_torn_by_add(self):
+        histogram = Histogram()
+        histogram.add(0.001)
+        since = histogram.mark()
+        counts, count, total = histogram.mark()
+        # As if another thread's add() had landed between copying counts and reading count
+        until = (counts, count + 1, total + 0.002)
+        self.assertEqual(histogram.snapshot(since=since, until=until), {'count': 0})
+
+    def test_snapshot_percentiles(self):
+        histogram = Histogram()
+        for _ in range(99):
+            histogram.add(0.001)
+        histogram.add(0.1)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 100)
+        self.assertAlmostEqual(snapshot['p50_ms'], 1.0, delta=0.15)
+        self.assertAlmostEqual(snapshot['max_ms'], 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
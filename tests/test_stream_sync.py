@@ -0,0 +1,44 @@
+import unittest
+
+from pylsl.util import LostError
+
+from machine_learning.stream_sync import StreamSynchronizer
+
+
+class FakeInlet(object):
+    """ChunkedInlet stand-in whose time_correction returns the queued results in turn."""
+    def __init__(self, corrections):
+        self.inlet = self
+        self.fs = 50
+        self.n_channels = 3
+        self.corrections = list(corrections)
+
+    def time_correction(self, timeout=None):
+        result = self.corrections.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class RefreshCorrectionsTest(unittest.TestCase):
+    def test_lost_stream_keeps_previous_offset(self):
+        gyro = FakeInlet([0.5, LostError('lost')])
+        accel = FakeInlet([0.25, 0.75])
+        sync = StreamSynchronizer({'gyro': gyro, 'accel': accel}, 'gyro', window_size=1,
+                                  correction_interval=0.0)
+        sync.refresh_corrections()
+        sync.refresh_corrections()
+        self.assertEqual(sync.offsets, {'gyro': 0.5, 'accel': 0.75})
+        self.assertEqual(sync.failed_corrections, 1)
+
+    def test_refresh_only_the_named_stream(self):
+        gyro = FakeInlet([0.5])
+        accel = FakeInlet([])  # Any call into it would fail
+        sync = StreamSynchronizer({'gyro': gyro, 'accel': accel}, 'gyro', window_size=1)
+        sync.refresh_if_due('gyro')
+        sync.refresh_if_due('gyro')  # Not due again for correction_interval
+        self.assertEqual(sync.offsets, {'gyro': 0.5, 'accel': 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()